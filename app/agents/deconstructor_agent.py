@@ -1,14 +1,10 @@
-from langchain_openai import AzureChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field  # Changed from langchain_core.pydantic_v1
 from typing import List
 
-from app.core.config import (
-    AZURE_OPENAI_API_KEY,
-    AZURE_OPENAI_ENDPOINT,
-    AZURE_OPENAI_API_VERSION,
-    AZURE_OPENAI_DEPLOYMENT_NAME
-)
+from app.core.config import get_deterministic_llm, structured_output_options
+from app.core.cache import cached_result
+from app.core.limits import ainvoke_azure
 
 # Define the output structure for deconstructed queries
 class DeconstructedQueries(BaseModel):
@@ -16,13 +12,7 @@ class DeconstructedQueries(BaseModel):
 
 class QueryDeconstructorAgent:
     def __init__(self):
-        self.llm = AzureChatOpenAI(
-            azure_deployment=AZURE_OPENAI_DEPLOYMENT_NAME,
-            api_version=AZURE_OPENAI_API_VERSION,
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            api_key=AZURE_OPENAI_API_KEY,
-            temperature=0
-        )
+        self.llm = get_deterministic_llm()
         # Create a prompt template that instructs the LLM on how to deconstruct queries
         # and to use the DeconstructedQueries tool for output.
         self.prompt = ChatPromptTemplate.from_messages([
@@ -30,12 +20,14 @@ class QueryDeconstructorAgent:
             ("human", "{query}")
         ])
         # Bind the Pydantic model to the LLM, forcing it to use the tool
-        self.structured_llm = self.llm.with_structured_output(DeconstructedQueries)
+        self.structured_llm = self.llm.with_structured_output(DeconstructedQueries, **structured_output_options())
+        # Compose the prompt and the LLM once; every call reuses the same chain
+        self.chain = self.prompt | self.structured_llm
 
+    @cached_result(DeconstructedQueries)
     async def deconstruct_query(self, query: str) -> DeconstructedQueries:
         """
         Deconstructs a complex query into simpler sub-queries.
         """
-        chain = self.prompt | self.structured_llm
-        response = await chain.ainvoke({"query": query})
+        response = await ainvoke_azure(self.chain, {"query": query})
         return response
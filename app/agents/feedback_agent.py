@@ -1,58 +1,182 @@
+import asyncio
+import atexit
 import logging
 import datetime
-import json
+import os
+import orjson
+from app.core import feedback_store
+from app.core.config import settings
 from app.schemas.research_schemas import UserFeedback
 
 # Configure basic logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=settings.LOG_LEVEL.upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+
+# fdatasync skips the metadata update where the platform has it
+_datasync = getattr(os, "fdatasync", os.fsync)
 
 class FeedbackAgent:
     """
     A simple agent to log user feedback to a file.
     In a real application, this might write to a database or a more sophisticated logging system.
+    Feedback is queued and appended by a background writer task in batches of up to
+    `batch_size` records (or whatever arrived within `batch_interval` seconds), with a
+    single fsync per batch; record_feedback returns once its batch is on disk.
     """
-    def __init__(self, feedback_file_path: str = "user_feedback.log"):
+    def __init__(self, feedback_file_path: str = "user_feedback.log", batch_size: int = 256, batch_interval: float = 0.1):
         self.feedback_file_path = feedback_file_path
-        # Ensure the log file exists or can be created
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        # The queue and writer task are created on first use, in the running event loop
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._writer_task: asyncio.Task | None = None
+        # The log is opened by the writer on the first write, not here, so constructing
+        # the agent does no file I/O; it then stays open for the life of the process.
+        self._fh = None
+        self._position = 0 # End of the log; advanced by every batch
+        atexit.register(self.close)
+
+    def _ensure_writer(self):
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            # A queue belongs to the event loop it is used in, so only a new loop gets a new one
+            self._queue = asyncio.Queue()
+            self._loop = loop
+            self._writer_task = None
+        if self._writer_task is None or self._writer_task.done():
+            # A restarted writer picks up the entries already queued
+            self._writer_task = asyncio.create_task(self._writer())
+
+    async def record_feedback(self, feedback_input: UserFeedback) -> UserFeedback | None:
+        """
+        Records user feedback by appending the UserFeedback object to the log file.
+        """
+        self._ensure_writer()
+        written = asyncio.get_running_loop().create_future()
+        await self._queue.put((orjson.dumps(feedback_input.model_dump()) + b"\n", feedback_input, written))
         try:
-            with open(self.feedback_file_path, "a") as f:
-                pass # Just to ensure it can be opened/created
+            await written
+        except Exception as e:
+            logging.error("Failed to write feedback to %s: %s", self.feedback_file_path, e)
+            return None
+        logging.info("Feedback recorded for query '%s': %s", feedback_input.original_query, feedback_input.feedback_text)
+        return feedback_input
+
+    async def _next_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.batch_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _open(self):
+        try:
+            self._fh = open(self.feedback_file_path, "ab", buffering=1 << 16)
         except IOError as e:
-            logging.error(f"Could not initialize feedback log file at {self.feedback_file_path}: {e}")
-            # Potentially raise an error or handle this more gracefully
+            logging.error(f"Could not open feedback log file at {self.feedback_file_path}: {e}")
+            raise
+        self._position = self._fh.tell()
 
-    def record_feedback(self, feedback_input: UserFeedback) -> UserFeedback | None:
+    def _write_batch(self, lines: list[bytes]):
+        if self._fh is None:
+            self._open()
+        self._fh.writelines(lines)
+        self._fh.flush()
+        _datasync(self._fh.fileno())
+
+    def _discard(self):
         """
-        Records user feedback by writing the UserFeedback object to a log file.
+        Closes and drops the log after a failed write; the next batch reopens it and takes
+        its position from the file, so the offsets given to feedback_store match the file again.
         """
+        fh, self._fh = self._fh, None
+        if fh is None:
+            return
         try:
-            with open(self.feedback_file_path, "a") as f:
-                f.write(feedback_input.model_dump_json() + "\\n")
-            logging.info(f"Feedback recorded for query '{feedback_input.original_query}': {feedback_input.feedback_text}")
-            return feedback_input
-        except IOError as e:
-            logging.error(f"Failed to write feedback to {self.feedback_file_path}: {e}")
-            return None
+            fh.close()
+        except OSError as e:
+            logging.warning("Failed to close feedback log %s: %s", self.feedback_file_path, e)
+
+    async def _writer(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await asyncio.to_thread(self._write_batch, [data for data, _, _ in batch])
+                for data, feedback, _ in batch:
+                    feedback_store.post_append(self.feedback_file_path, self._position, self._position + len(data), feedback)
+                    self._position += len(data)
+            except Exception as e:
+                # Every caller waiting on this batch is told it failed; none is left waiting
+                await asyncio.to_thread(self._discard)
+                for _, _, written in batch:
+                    if not written.done():
+                        written.set_exception(e)
+            else:
+                for _, _, written in batch:
+                    if not written.done():
+                        written.set_result(None)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def flush(self):
+        """Waits until all queued feedback is on disk, e.g. before the log is read back or on shutdown."""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            self._ensure_writer() # Restarts a writer that died, so queued entries are written rather than skipped
+            await self._queue.join()
+
+    async def log_version(self) -> str:
+        """
+        A cheap tag that changes whenever feedback is appended to (or the log is replaced),
+        so clients can tell whether an earlier analysis is still current.
+        """
+        await self.flush()
+        try:
+            stat = await asyncio.to_thread(os.stat, self.feedback_file_path)
+        except FileNotFoundError:
+            return "0"
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def close(self):
+        if self._fh is None or self._fh.closed:
+            return
+        self._fh.close()
 
 # Example usage (optional, for testing)
 if __name__ == "__main__":
     import datetime # Ensure datetime is imported for the example
     feedback_agent = FeedbackAgent(feedback_file_path="test_feedback.log")
-    
-    # Example of creating a UserFeedback object for testing
-    test_feedback_1 = UserFeedback(
-        original_query="What is quantum computing?",
-        feedback_text="The explanation was clear and concise.",
-        rating=5,
-        timestamp=datetime.datetime.now(datetime.timezone.utc).isoformat()
-    )
-    feedback_agent.record_feedback(test_feedback_1)
-    
-    test_feedback_2 = UserFeedback(
-        original_query="Explain black holes.",
-        feedback_text="A bit too technical for a beginner.",
-        # Rating is optional
-        timestamp=datetime.datetime.now(datetime.timezone.utc).isoformat()
-    )
-    feedback_agent.record_feedback(test_feedback_2)
-    print(f"Test feedback written to test_feedback.log")
+
+    async def main():
+        # Example of creating a UserFeedback object for testing
+        test_feedback_1 = UserFeedback(
+            original_query="What is quantum computing?",
+            feedback_text="The explanation was clear and concise.",
+            rating=5,
+            timestamp=datetime.datetime.now(datetime.timezone.utc).isoformat()
+        )
+        await feedback_agent.record_feedback(test_feedback_1)
+
+        test_feedback_2 = UserFeedback(
+            original_query="Explain black holes.",
+            feedback_text="A bit too technical for a beginner.",
+            # Rating is optional
+            timestamp=datetime.datetime.now(datetime.timezone.utc).isoformat()
+        )
+        await feedback_agent.record_feedback(test_feedback_2)
+        await feedback_agent.flush()
+        print(f"Test feedback written to test_feedback.log")
+
+    asyncio.run(main())
@@ -1,68 +1,183 @@
-import json
-from typing import List, Dict, Any
+import asyncio
+import logging
+import os
+import orjson
+from pathlib import Path
+from typing import Iterator
 from pydantic import ValidationError
 from app.schemas.research_schemas import UserFeedback, FeedbackAnalysisResult
-from app.core.config import llm # Assuming LLM is configured for use
+from app.core import feedback_store
+from app.core.config import get_llm # Assuming LLM is configured for use
+from app.core.limits import ainvoke_azure
 
 FEEDBACK_FILE = "user_feedback.log"
+READ_CHUNK_SIZE = 64 * 1024
+
+_FEEDBACK_FIELDS = frozenset(UserFeedback.model_fields)
+
+logger = logging.getLogger(__name__)
+
+def _empty_state() -> dict:
+    return {"count": 0, "sum_rating": 0, "offset": 0, "summary": None}
 
 class FeedbackAnalyzerAgent:
-    def __init__(self):
+    def __init__(self, validate_entries: bool = False):
         self.feedback_file = FEEDBACK_FILE
+        # Running aggregates and the rolling summary are persisted next to the log,
+        # so each analysis only reads and summarizes the entries appended since the last one.
+        self.state_file = str(Path(self.feedback_file).with_suffix(".state.json"))
+        # The log is written by FeedbackAgent from already-validated models, so complete
+        # entries are trusted and built with model_construct unless validation is requested.
+        self.validate_entries = validate_entries
+        self._lock = asyncio.Lock() # One analysis at a time, so the state is never updated twice for the same entries
 
-    def _load_feedback(self) -> List[UserFeedback]:
-        feedback_list = []
+    def _parse_line(self, line: bytes) -> UserFeedback | None:
+        line = line.strip()
+        if not line:
+            return None
         try:
-            with open(self.feedback_file, "r") as f:
-                for line in f:
-                    try:
-                        data = json.loads(line.strip())
-                        feedback_list.append(UserFeedback(**data))
-                    except (json.JSONDecodeError, ValidationError) as e:
-                        print(f"Skipping invalid feedback entry: {line.strip()} - Error: {e}")
+            data = orjson.loads(line)
+            if not self.validate_entries and isinstance(data, dict) and _FEEDBACK_FIELDS <= data.keys():
+                return UserFeedback.model_construct(**data)
+            return UserFeedback.model_validate(data)
+        except (orjson.JSONDecodeError, ValidationError) as e:
+            # Formatted only when debug logging is enabled; _iter_feedback logs a total instead
+            logger.debug("Skipping invalid feedback entry: %r - Error: %s", line, e)
+            return None
+
+    def _iter_feedback(self, offset: int = 0) -> Iterator[tuple[int, UserFeedback | None]]:
+        """
+        Streams the log from byte `offset` in fixed-size binary blocks, yielding each
+        entry (None for an invalid line) with the offset just past its line.
+        """
+        invalid_lines = 0
+        with open(self.feedback_file, "rb") as f:
+            f.seek(offset)
+            remainder = b""
+            while chunk := f.read(READ_CHUNK_SIZE):
+                lines = (remainder + chunk).split(b"\n")
+                remainder = lines.pop() # Possibly incomplete last line, carried into the next block
+                for line in lines:
+                    offset += len(line) + 1
+                    entry = self._parse_line(line)
+                    if entry is None and line.strip():
+                        invalid_lines += 1
+                    yield offset, entry
+            # A last line without a newline may still be being written; it is read next time.
+        if invalid_lines:
+            logger.warning("Skipped %d invalid feedback entries in %s", invalid_lines, self.feedback_file)
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_file, "rb") as f:
+                state = orjson.loads(f.read())
         except FileNotFoundError:
-            print(f"Feedback file {self.feedback_file} not found.")
-        return feedback_list
+            return _empty_state()
+        except (OSError, orjson.JSONDecodeError) as e:
+            logger.warning("Could not read feedback analysis state %s, starting over: %s", self.state_file, e)
+            return _empty_state()
+        # Start over if the log was truncated or replaced since the state was saved
+        try:
+            if os.path.getsize(self.feedback_file) < state["offset"]:
+                return _empty_state()
+        except OSError:
+            return _empty_state()
+        return state
+
+    def _save_state(self, state: dict):
+        tmp_file = f"{self.state_file}.tmp"
+        try:
+            with open(tmp_file, "wb") as f:
+                f.write(orjson.dumps(state))
+            os.replace(tmp_file, self.state_file) # Atomic, so a crash never leaves a half-written state
+        except OSError as e:
+            logger.error("Could not save feedback analysis state to %s: %s", self.state_file, e)
 
     async def analyze_feedback(self) -> FeedbackAnalysisResult:
-        feedback_entries = self._load_feedback()
+        async with self._lock:
+            return await self._analyze_feedback()
 
-        if not feedback_entries:
+    def _collect_new_feedback(self) -> tuple[dict, list[str]]:
+        """
+        Loads the saved state and adds the entries appended since the last analysis to it;
+        returns the state with the new entries' text lines. Blocking; call it via asyncio.to_thread.
+        """
+        state = self._load_state()
+
+        # Aggregate only the entries appended since the last analysis. Entries written by
+        # this process are taken from the in-memory buffer; the log is read only when the
+        # buffer does not cover them (e.g. after a restart).
+        new_feedback_lines = []
+        offset = state["offset"]
+        new_entries = feedback_store.entries_since(self.feedback_file, offset)
+        if new_entries is None:
+            new_entries = self._iter_feedback(offset)
+        try:
+            for offset, entry in new_entries:
+                if entry is None:
+                    continue
+                state["count"] += 1
+                state["sum_rating"] += entry.rating
+                if entry.feedback_text:
+                    new_feedback_lines.append(f"- Rating: {entry.rating}/5, Feedback: {entry.feedback_text}")
+        except FileNotFoundError:
+            logger.info("Feedback file %s not found.", self.feedback_file)
+        state["offset"] = offset
+        return state, new_feedback_lines
+
+    async def _analyze_feedback(self) -> FeedbackAnalysisResult:
+        # Reading (possibly the whole log) and saving the state run in a worker thread,
+        # so they don't stall the event loop; the lock keeps analyses from overlapping
+        state, new_feedback_lines = await asyncio.to_thread(self._collect_new_feedback)
+
+        total_entries = state["count"]
+        if total_entries == 0:
+            await asyncio.to_thread(self._save_state, state)
             return FeedbackAnalysisResult(
                 total_feedback_entries=0,
                 average_rating=None,
                 feedback_summary="No feedback entries found to analyze.",
             )
 
-        total_entries = len(feedback_entries)
-        average_rating = sum(entry.rating for entry in feedback_entries) / total_entries if total_entries > 0 else None
-
-        # For more sophisticated analysis, use an LLM to summarize feedback text
-        # Concatenate feedback texts for summarization
-        all_feedback_texts = "\n".join([f"- Rating: {entry.rating}/5, Feedback: {entry.feedback_text}" for entry in feedback_entries if entry.feedback_text])
+        average_rating = state["sum_rating"] / total_entries
 
-        if not all_feedback_texts:
+        if not new_feedback_lines:
+            # Nothing new to summarize; reuse the rolling summary
+            await asyncio.to_thread(self._save_state, state)
             return FeedbackAnalysisResult(
                 total_feedback_entries=total_entries,
                 average_rating=average_rating,
-                feedback_summary="No textual feedback provided to summarize.",
+                feedback_summary=state["summary"] or "No textual feedback provided to summarize.",
             )
 
+        # For more sophisticated analysis, use an LLM to summarize feedback text.
+        # The previous summary stands in for the older entries, so only new text is sent.
+        new_feedback_texts = "\n".join(new_feedback_lines)
+        if state["summary"]:
+            feedback_section = f"""Summary of earlier feedback:
+{state["summary"]}
+
+New Feedback Entries:
+{new_feedback_texts}"""
+        else:
+            feedback_section = f"""Feedback Entries:
+{new_feedback_texts}"""
+
         try:
             prompt = f"""Analyze the following user feedback entries for an AI Research Advisor application.
 Provide a concise summary of common themes, praises, criticisms, and suggestions.
 Focus on actionable insights that could help improve the application.
 
-Feedback Entries:
-{all_feedback_texts}
+{feedback_section}
 
 Summary:"""
             
-            response = await llm.ainvoke(prompt)
+            response = await ainvoke_azure(get_llm(), prompt)
             summary_text = response.content if hasattr(response, 'content') else str(response) # Adapt based on LLM response structure
 
         except Exception as e:
-            print(f"Error during LLM feedback summarization: {e}")
+            # The state is not saved, so these entries are summarized again on the next call
+            logger.error("Error during LLM feedback summarization: %s", e)
             summary_text = "Could not generate AI summary due to an error."
             return FeedbackAnalysisResult(
                 total_feedback_entries=total_entries,
@@ -71,6 +186,8 @@ Summary:"""
                 error_message=f"LLM summarization error: {str(e)}"
             )
 
+        state["summary"] = summary_text
+        await asyncio.to_thread(self._save_state, state)
         return FeedbackAnalysisResult(
             total_feedback_entries=total_entries,
             average_rating=average_rating,
@@ -79,7 +196,6 @@ Summary:"""
 
 # Example usage (for testing or a standalone script)
 if __name__ == "__main__":
-    import asyncio
     analyzer = FeedbackAnalyzerAgent()
     
     # Ensure there's some dummy data in user_feedback.log for testing
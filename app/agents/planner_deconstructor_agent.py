@@ -0,0 +1,37 @@
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+from typing import List
+
+from app.core.config import get_deterministic_llm, structured_output_options
+from app.core.cache import cached_result
+from app.core.limits import ainvoke_azure
+
+# Define the combined output structure for deconstruction and planning
+class DeconstructedPlan(BaseModel):
+    queries: List[str] = Field(description="A list of deconstructed, more specific queries.")
+    plan_steps: List[str] = Field(description="A list of steps to execute the research based on the deconstructed queries.")
+    synthesis_questions: List[str] = Field(description="Questions to guide the final synthesis of information.")
+
+class PlannerDeconstructorAgent:
+    """
+    Deconstructs a query and drafts its research plan in a single LLM call,
+    saving the separate planning round-trip. The plan is made before retrieval,
+    so it cannot take the retrieved information into account.
+    """
+    def __init__(self):
+        self.llm = get_deterministic_llm()
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", "You are an expert query deconstructor and research planner. Break down the user's complex query into smaller, manageable, and specific sub-queries that can be independently researched. Then create a plan to research these sub-queries and synthesize the findings into an answer to the main query. Respond using the DeconstructedPlan tool."),
+            ("human", "{query}")
+        ])
+        self.structured_llm = self.llm.with_structured_output(DeconstructedPlan, **structured_output_options())
+        # Compose the prompt and the LLM once; every call reuses the same chain
+        self.chain = self.prompt | self.structured_llm
+
+    @cached_result(DeconstructedPlan)
+    async def deconstruct_and_plan(self, query: str) -> DeconstructedPlan:
+        """
+        Deconstructs a complex query into sub-queries and creates a research plan for them.
+        """
+        response = await ainvoke_azure(self.chain, {"query": query})
+        return response
@@ -1,28 +1,66 @@
-from langchain_openai import AzureChatOpenAI
+import asyncio
 from langchain_core.prompts import ChatPromptTemplate
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from langchain_community.tools.tavily_search import TavilySearchResults # Added import
+from langchain_community.utilities.tavily_search import TAVILY_API_URL, TavilySearchAPIWrapper
 
 # For this example, we'll simulate retrieval with an LLM call.
 # from langchain_community.retrievers import ... (e.g., TavilySearchResultsRetriever, ArxivRetriever)
 
-from app.core.config import (
-    AZURE_OPENAI_API_KEY,
-    AZURE_OPENAI_ENDPOINT,
-    AZURE_OPENAI_API_VERSION,
-    AZURE_OPENAI_DEPLOYMENT_NAME,
-    TAVILY_API_KEY # Added import
-)
+from app.core.config import get_deterministic_llm, settings
+from app.core.cache import agent_cache, make_key
+from app.core.http import get_http_async_client
+from app.core.limits import ainvoke_tavily, abatch_tavily
+
+# Retrieval results that carry no usable information start with one of these
+PLACEHOLDER_PREFIX = "Placeholder information for"
+ERROR_PREFIX = "Error retrieving information for"
+NO_CONTENT_PREFIX = "No content found by Tavily for"
+_UNUSABLE_PREFIXES = (PLACEHOLDER_PREFIX, ERROR_PREFIX, NO_CONTENT_PREFIX)
+
+def is_usable_information(info: Any) -> bool:
+    """Whether a retrieval result holds actual content (not a placeholder, error or empty result)."""
+    return isinstance(info, str) and not info.startswith(_UNUSABLE_PREFIXES)
+
+def is_retrieval_error(info: Any) -> bool:
+    """Whether a retrieval result reports a failed search, which may succeed if tried again."""
+    return isinstance(info, Exception) or (isinstance(info, str) and info.startswith(ERROR_PREFIX))
+
+class SharedClientTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+    """
+    Tavily API wrapper whose async searches go through the shared HTTP client
+    (app/core/http.py) instead of opening a new aiohttp session for every call.
+    """
+    async def raw_results_async(
+        self,
+        query: str,
+        max_results: Optional[int] = 5,
+        search_depth: Optional[str] = "advanced",
+        include_domains: Optional[List[str]] = None,
+        exclude_domains: Optional[List[str]] = None,
+        include_answer: Optional[bool] = False,
+        include_raw_content: Optional[bool] = False,
+        include_images: Optional[bool] = False,
+    ) -> Dict:
+        params = {
+            "api_key": self.tavily_api_key.get_secret_value(),
+            "query": query,
+            "max_results": max_results,
+            "search_depth": search_depth,
+            "include_domains": include_domains or [],
+            "exclude_domains": exclude_domains or [],
+            "include_answer": include_answer,
+            "include_raw_content": include_raw_content,
+            "include_images": include_images,
+        }
+        response = await get_http_async_client().post(f"{TAVILY_API_URL}/search", json=params)
+        if response.status_code != 200:
+            raise Exception(f"Error {response.status_code}: {response.reason_phrase}")
+        return response.json()
 
 class InformationRetrieverAgent:
     def __init__(self):
-        self.llm = AzureChatOpenAI(
-            azure_deployment=AZURE_OPENAI_DEPLOYMENT_NAME,
-            api_version=AZURE_OPENAI_API_VERSION,
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            api_key=AZURE_OPENAI_API_KEY,
-            temperature=0
-        )
+        self.llm = get_deterministic_llm()
         # This is a simplified prompt. A real retrieval agent would use tools/vector stores.
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", "You are an information retrieval agent. Given a specific query, provide a concise summary of relevant information. For this basic version, you will act as a mock retriever."),
@@ -30,11 +68,44 @@ class InformationRetrieverAgent:
         ])
 
         # Initialize Tavily search tool
-        if not TAVILY_API_KEY:
+        if not settings.TAVILY_API_KEY:
             print("Warning: TAVILY_API_KEY not set. Web search will not function.")
             self.search_tool = None
         else:
-            self.search_tool = TavilySearchResults(max_results=3, api_key=TAVILY_API_KEY)
+            self.search_tool = TavilySearchResults(
+                max_results=3,
+                api_wrapper=SharedClientTavilySearchAPIWrapper(tavily_api_key=settings.TAVILY_API_KEY)
+            )
+
+    def _cache_key(self, sub_query: str) -> str:
+        # Sub-queries differing only in case or whitespace share an entry, so overlapping
+        # deconstructions of different queries reuse each other's searches
+        normalized_sub_query = " ".join(sub_query.split()).casefold()
+        return make_key("tavily", normalized_sub_query, self.search_tool.max_results)
+
+    async def _process_results(self, sub_query: str, results: Any) -> str:
+        """
+        Turns raw Tavily results into the text stored for a sub-query,
+        caching it when the search produced content.
+        """
+        # Process results: TavilySearchResults returns a list of dicts or a string
+        # For simplicity, we'll join the content of the results.
+        match results:
+            case list():
+                # Assuming results is a list of dictionaries with a 'content' key
+                # Example structure: [{'url': '...', 'content': '...'}, ...]
+                processed_results = "\n".join(content for item in results if (content := item.get('content')))
+                if not processed_results:
+                    return f"{NO_CONTENT_PREFIX} '{sub_query}'."
+                # Only successful searches are cached; errors and empty results are retried next time.
+                if agent_cache is not None:
+                    await agent_cache.set(self._cache_key(sub_query), processed_results, ttl=settings.RETRIEVAL_CACHE_TTL)
+                return processed_results
+            case str():
+                # TavilySearchResults reports a failed search as the repr of its exception
+                return f"{ERROR_PREFIX} '{sub_query}' using Tavily: {results}"
+            case _:
+                return f"{ERROR_PREFIX} '{sub_query}' using Tavily: unexpected result type {type(results).__name__}."
 
     async def retrieve_information(self, sub_query: str) -> str:
         """
@@ -44,30 +115,64 @@ class InformationRetrieverAgent:
         print(f"InformationRetrieverAgent: Attempting to retrieve information for: {sub_query}")
         if not self.search_tool:
             # Fallback if Tavily is not configured
-            return f"Placeholder information for '{sub_query}'. (Tavily API key not configured)"
+            return f"{PLACEHOLDER_PREFIX} '{sub_query}'. (Tavily API key not configured)"
         
+        if agent_cache is not None:
+            cached = await agent_cache.get(self._cache_key(sub_query))
+            if cached is not None:
+                print(f"Using cached Tavily results for: {sub_query}")
+                return cached
+
         try:
             print(f"Using Tavily to search for: {sub_query}")
-            results = await self.search_tool.ainvoke(sub_query)
-            # Process results: TavilySearchResults returns a list of dicts or a string
-            # For simplicity, we'll join the content of the results.
-            if isinstance(results, list):
-                # Assuming results is a list of dictionaries with a 'content' key
-                # Example structure: [{'url': '...', 'content': '...'}, ...]
-                processed_results = "\n".join([item.get('content', '') for item in results if item.get('content')])
-                return processed_results if processed_results else f"No content found by Tavily for '{sub_query}'."
-            elif isinstance(results, str):
-                return results # If it's already a string
-            else:
-                return f"Received unexpected result type from Tavily for '{sub_query}'."
-
+            results = await ainvoke_tavily(self.search_tool, sub_query)
+            return await self._process_results(sub_query, results)
         except Exception as e:
             print(f"Error during Tavily search for '{sub_query}': {e}")
-            return f"Error retrieving information for '{sub_query}' using Tavily: {e}"
+            return f"{ERROR_PREFIX} '{sub_query}' using Tavily: {e}"
+
+    async def retrieve_many(self, sub_queries: List[str], prefetched: Dict[str, str] | None = None) -> Dict[str, str | Exception]:
+        """
+        Retrieves information for several sub-queries at once.
+        Sub-queries found in `prefetched` (already retrieved elsewhere) or in the cache are
+        not searched again; the rest are searched with a single batched Tavily call.
+        A failed search is reported for its sub-query only, in the same way as retrieve_information.
+        Repeated sub-queries, including ones differing only in case or whitespace, are searched once.
+        """
+        sub_queries = list(dict.fromkeys(sub_queries))
+        prefetched = prefetched or {}
+        retrieved: Dict[str, str | Exception] = {sub_query: prefetched[sub_query] for sub_query in sub_queries if sub_query in prefetched}
+        if not self.search_tool:
+            for sub_query in sub_queries:
+                if sub_query not in retrieved:
+                    retrieved[sub_query] = await self.retrieve_information(sub_query)
+            return {sub_query: retrieved[sub_query] for sub_query in sub_queries}
+
+        if agent_cache is not None:
+            lookup = [sub_query for sub_query in sub_queries if sub_query not in retrieved]
+            cached = await asyncio.gather(*(agent_cache.get(self._cache_key(sub_query)) for sub_query in lookup))
+            retrieved.update((sub_query, info) for sub_query, info in zip(lookup, cached) if info is not None)
+
+        # Sub-queries sharing a cache key are searched once; the first spelling is sent to Tavily
+        to_search: Dict[str, List[str]] = {}
+        for sub_query in sub_queries:
+            if sub_query not in retrieved:
+                to_search.setdefault(self._cache_key(sub_query), []).append(sub_query)
+        if to_search:
+            print(f"Using Tavily to search for {len(to_search)} sub-queries ({len(retrieved)} already retrieved)")
+            results = await abatch_tavily(self.search_tool, [same_key[0] for same_key in to_search.values()])
+            for same_key, result in zip(to_search.values(), results):
+                if isinstance(result, Exception):
+                    print(f"Error during Tavily search for '{same_key[0]}': {result}")
+                    info = f"{ERROR_PREFIX} '{same_key[0]}' using Tavily: {result}"
+                else:
+                    info = await self._process_results(same_key[0], result)
+                retrieved.update((sub_query, info) for sub_query in same_key)
+
+        return {sub_query: retrieved[sub_query] for sub_query in sub_queries}
 
 # Example usage (for testing purposes)
 if __name__ == '__main__':
-    import asyncio
     # You would need to have TAVILY_API_KEY set in your environment for this to work
     # For local testing, ensure your .env file is in a location discoverable by load_dotenv
     # or manually set the environment variable.
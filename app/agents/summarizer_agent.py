@@ -1,34 +1,86 @@
-from langchain_openai import AzureChatOpenAI
+import functools
+import tiktoken
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, List
 
-from app.core.config import (
-    AZURE_OPENAI_API_KEY,
-    AZURE_OPENAI_ENDPOINT,
-    AZURE_OPENAI_API_VERSION,
-    AZURE_OPENAI_DEPLOYMENT_NAME
-)
+from app.agents.retriever_agent import is_usable_information
+from app.core.config import get_deterministic_llm, settings, structured_output_options
+from app.core.cache import cached_result
+from app.core.limits import ainvoke_azure, abatch_azure
 
 # Define the output structure for the summary
 class SummarizedOutput(BaseModel):
     summary: str = Field(description="A concise summary of the provided information.")
 
+@functools.lru_cache(maxsize=1)
+def _token_encoding() -> tiktoken.Encoding | None:
+    # Azure deployment names are user-defined, so fall back to the GPT-4 family encoding.
+    try:
+        try:
+            return tiktoken.encoding_for_model(settings.AZURE_OPENAI_DEPLOYMENT_NAME)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e: # tiktoken downloads its encodings on first use
+        print(f"Warning: could not load a tiktoken encoding ({e}). Estimating tokens from characters.")
+        return None
+
+def _truncate_tokens(text: str, max_tokens: int) -> tuple[str, int]:
+    """Returns text cut to at most max_tokens tokens, and its token count."""
+    encoding = _token_encoding()
+    if encoding is None: # Roughly 4 characters per token for English text
+        text = text[:max_tokens * 4]
+        return text, -(-len(text) // 4)
+    tokens = encoding.encode(text)
+    if len(tokens) > max_tokens:
+        return encoding.decode(tokens[:max_tokens]), max_tokens
+    return text, len(tokens)
+
 class SummarizerAgent:
-    def __init__(self):
-        self.llm = AzureChatOpenAI(
-            azure_deployment=AZURE_OPENAI_DEPLOYMENT_NAME,
-            api_version=AZURE_OPENAI_API_VERSION,
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            api_key=AZURE_OPENAI_API_KEY,
-            temperature=0
-        )
+    def __init__(self, chunk_tokens: int | None = None):
+        self.llm = get_deterministic_llm()
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", "You are an expert summarizer. Your task is to create a concise and coherent summary of the provided text. Focus on the key information and present it clearly. Respond using the SummarizedOutput tool."),
             ("human", "Please summarize the following information:\n\n{combined_information}\n\nProvide a concise summary.")
         ])
-        self.structured_llm = self.llm.with_structured_output(SummarizedOutput)
+        self.structured_llm = self.llm.with_structured_output(SummarizedOutput, **structured_output_options())
+        # Compose the prompt and the LLM once; every call reuses the same chain
+        self.chain = self.prompt | self.structured_llm
+        # Token budget per summarization call; larger inputs are summarized map-reduce style.
+        self.chunk_tokens = chunk_tokens or settings.SUMMARY_CHUNK_TOKENS
+        self.bypass_chars = settings.SUMMARY_BYPASS_CHARS
+
+    async def _summarize_text(self, text: str) -> SummarizedOutput:
+        return await ainvoke_azure(self.chain, {"combined_information": text})
+
+    async def _summarize_chunks(self, chunks: List[List[str]]) -> List[SummarizedOutput]:
+        return await abatch_azure(self.chain, [{"combined_information": "\n\n".join(chunk)} for chunk in chunks])
+
+    def _chunk(self, entries: List[str]) -> List[List[str]]:
+        """Packs entries, in order, into chunks of at most chunk_tokens tokens."""
+        chunks, current, current_tokens = [], [], 0
+        for entry in entries:
+            entry, entry_tokens = _truncate_tokens(entry, self.chunk_tokens) # A single oversized entry is truncated to fit
+            if current and current_tokens + entry_tokens > self.chunk_tokens:
+                chunks.append(current)
+                current, current_tokens = [], 0
+            current.append(entry)
+            current_tokens += entry_tokens
+        if current:
+            chunks.append(current)
+        return chunks
 
+    def verbatim_summary(self, retrieved_information: Dict[str, Any]) -> SummarizedOutput | None:
+        """
+        Returns the usable retrieved information itself as the summary when it is already
+        shorter than bypass_chars, so no LLM call is needed; otherwise None.
+        """
+        usable = {sub_query: info for sub_query, info in retrieved_information.items() if is_usable_information(info)}
+        if not usable or sum(len(info) for info in usable.values()) >= self.bypass_chars:
+            return None
+        return SummarizedOutput(summary="\n\n".join(f"**{sub_query}**: {info}" for sub_query, info in usable.items()))
+
+    @cached_result(SummarizedOutput)
     async def summarize_information(self, retrieved_information: Dict[str, Any]) -> SummarizedOutput:
         """
         Summarizes the retrieved information.
@@ -37,27 +89,24 @@ class SummarizerAgent:
         # Assuming retrieved_information is Dict[sub_query, text_info]
         combined_text = []
         for sub_query, info in retrieved_information.items():
-            if isinstance(info, str) and not info.startswith("Placeholder information for") and not info.startswith("Error retrieving information for") and not info.startswith("No content found by Tavily for"):
+            if is_usable_information(info):
                 combined_text.append(f"Information regarding '{sub_query}':\n{info}\n---")
         
         if not combined_text:
             return SummarizedOutput(summary="No valid information was available to summarize.")
 
-        full_text_to_summarize = "\n\n".join(combined_text)
-        
-        # Check token limit (very basic check, a more robust solution would use a tokenizer)
-        # GPT-4 context can be large, but let's be mindful.
-        # This is a rough estimate, actual token count will vary.
-        # A common token limit for prompts might be around 4000-8000 tokens for older models,
-        # newer models support much larger contexts.
-        # For now, let's assume the combined text won't exceed limits for typical use cases.
-        # If it does, truncation or iterative summarization would be needed.
-
-        chain = self.prompt | self.structured_llm
-        response = await chain.ainvoke({
-            "combined_information": full_text_to_summarize
-        })
-        return response
+        chunks = self._chunk(combined_text)
+        while len(chunks) > 1:
+            # Map: summarize each chunk concurrently.
+            partials = await self._summarize_chunks(chunks)
+            # Reduce: the partial summaries become the entries of the next round.
+            partial_entries = [f"Partial summary {i + 1}:\n{partial.summary}\n---" for i, partial in enumerate(partials)]
+            next_chunks = self._chunk(partial_entries)
+            if len(next_chunks) >= len(chunks): # Partials did not shrink enough to merge; reduce them in one call
+                next_chunks = [partial_entries]
+            chunks = next_chunks
+
+        return await self._summarize_text("\n\n".join(chunks[0]))
 
 if __name__ == '__main__':
     import asyncio
@@ -0,0 +1,188 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple, Type
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Set for the duration of a forced refresh: cached values are not read, but fresh
+# results are still written, so the refresh also updates the cache.
+bypass_cache: contextvars.ContextVar[bool] = contextvars.ContextVar("bypass_cache", default=False)
+
+class DiskCache:
+    """
+    A small content-addressed key/value cache persisted in a SQLite file.
+    Blocking SQLite calls run in a worker thread so they don't stall the event loop.
+    Recently used entries are also kept in an in-process LRU, so repeated lookups
+    don't go to disk at all.
+    The file is bounded too: entries without a TTL get `default_ttl`, and every
+    `_PRUNE_EVERY` writes expired entries are deleted, then the least recently used
+    ones beyond `max_entries`.
+    """
+    _PRUNE_EVERY = 1000 # Writes between prunes
+
+    def __init__(self, cache_dir: str, memory_size: int = 0, max_entries: int = 0, default_ttl: float | None = None):
+        # key -> (value, expires_at); only touched from the event loop thread
+        self._memory: OrderedDict[str, Tuple[str, float | None]] = OrderedDict()
+        self._memory_size = memory_size
+        self._max_entries = max_entries
+        self._default_ttl = default_ttl
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "cache.db"), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, last_used REAL NOT NULL DEFAULT 0)"
+            )
+            # Caches created before eviction existed lack the column; their entries count as least recently used
+            if "last_used" not in {row[1] for row in self._conn.execute("PRAGMA table_info(cache)")}:
+                self._conn.execute("ALTER TABLE cache ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)")
+            self._conn.commit()
+        self._prune()
+
+    def _get(self, key: str) -> Tuple[str, float | None] | None:
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is not None and (row[1] is None or row[1] >= now):
+                    self._conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Cache read failed: %s", e)
+            return None
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < now:
+            return None
+        return value, expires_at
+
+    def _set(self, key: str, value: str, expires_at: float | None):
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, time.time())
+                )
+                self._conn.commit()
+                self._writes += 1
+                prune = self._writes % self._PRUNE_EVERY == 0
+        except sqlite3.Error as e:
+            logger.warning("Cache write failed: %s", e)
+            return
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        """Deletes expired entries, then the least recently used ones beyond max_entries."""
+        try:
+            with self._lock:
+                expired = self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),)).rowcount
+                evicted = 0
+                if self._max_entries > 0:
+                    evicted = self._conn.execute(
+                        "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                        (self._max_entries,)
+                    ).rowcount
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Cache prune failed: %s", e)
+            return
+        if expired or evicted:
+            logger.info("Cache pruned: %d expired and %d least recently used entries deleted", expired, evicted)
+
+    def _remember(self, key: str, value: str, expires_at: float | None):
+        if self._memory_size <= 0:
+            return
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self._memory_size:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> str | None:
+        if bypass_cache.get():
+            return None
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at >= time.time():
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._memory[key]
+        entry = await asyncio.to_thread(self._get, key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, *entry)
+        return entry[0]
+
+    async def set(self, key: str, value: str, ttl: float | None = None):
+        ttl = ttl or self._default_ttl
+        expires_at = time.time() + ttl if ttl else None
+        self._remember(key, value, expires_at)
+        await asyncio.to_thread(self._set, key, value, expires_at)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters since startup (reads skipped by bypass_cache are not counted)."""
+        return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory)}
+
+def make_key(*parts: Any) -> str:
+    """Hashes arbitrary JSON-like parts into a stable cache key."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=32).hexdigest()
+
+agent_cache = DiskCache(
+    settings.AGENT_CACHE_DIR,
+    memory_size=settings.AGENT_CACHE_MEMORY_SIZE,
+    max_entries=settings.AGENT_CACHE_MAX_ENTRIES,
+    default_ttl=settings.AGENT_CACHE_DEFAULT_TTL,
+) if settings.AGENT_CACHE_ENABLED else None
+
+def _prompt_digest(agent: Any) -> str:
+    """
+    Hash of the agent's prompt, computed once per prompt object rather than on every call
+    (repr walks the whole template). A replaced prompt gets a new digest.
+    """
+    cached = agent.__dict__.get("_prompt_digest")
+    if cached is None or cached[0] is not agent.prompt:
+        cached = agent._prompt_digest = (agent.prompt, make_key(repr(agent.prompt)))
+    return cached[1]
+
+def cached_result(model: Type[BaseModel]):
+    """
+    Caches the Pydantic result of an agent coroutine method.
+    The key covers the method, the agent's prompt, the model deployment and the call arguments,
+    so changing any of them misses the cache.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            if agent_cache is None:
+                return await func(self, *args, **kwargs)
+            key = make_key(func.__qualname__, _prompt_digest(self), settings.AZURE_OPENAI_DEPLOYMENT_NAME, args, kwargs)
+            cached = await agent_cache.get(key)
+            if cached is not None:
+                return model.model_validate_json(cached)
+            result = await func(self, *args, **kwargs)
+            await agent_cache.set(key, result.model_dump_json())
+            return result
+        return wrapper
+    return decorator
@@ -1,28 +1,92 @@
-import os
-from dotenv import load_dotenv
+from functools import lru_cache
+from pathlib import Path
 
-load_dotenv()
+from langchain_openai import AzureChatOpenAI
+from pydantic import Field, SecretStr, ValidationError
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
-AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-TAVILY_API_KEY = os.getenv("TAVILY_API_KEY") # Added Tavily API key
+class Settings(BaseSettings):
+    """Application settings, read once from the environment and the project's .env file."""
+    model_config = SettingsConfigDict(
+        env_file=Path(__file__).resolve().parents[2] / ".env",
+        extra="ignore"
+    )
 
-if not all([AZURE_OPENAI_API_KEY, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_DEPLOYMENT_NAME]):
-    raise ValueError("Azure OpenAI credentials are not fully configured in .env file.")
+    AZURE_OPENAI_API_KEY: SecretStr = Field(min_length=1)
+    AZURE_OPENAI_ENDPOINT: str = Field(min_length=1)
+    AZURE_OPENAI_API_VERSION: str = Field(min_length=1)
+    AZURE_OPENAI_DEPLOYMENT_NAME: str = Field(min_length=1)
+    TAVILY_API_KEY: SecretStr | None = None # Added Tavily API key
 
-# Initialize the LLM client (e.g., AzureChatOpenAI)
-# This was missing and caused the ImportError in FeedbackAnalyzerAgent
-from langchain_openai import AzureChatOpenAI
+    # Root log level; DEBUG adds per-node state dumps from the research graph
+    LOG_LEVEL: str = "INFO"
+
+    # Maximum concurrent calls to each external service (see app/core/limits.py)
+    AZURE_MAX_PARALLEL: int = 20
+    TAVILY_MAX_PARALLEL: int = 5
+
+    # On-disk cache of agent results (see app/core/cache.py)
+    AGENT_CACHE_ENABLED: bool = True
+    AGENT_CACHE_DIR: str = ".agent_cache"
+    AGENT_CACHE_MEMORY_SIZE: int = 10_000 # Entries also kept in process memory, least recently used evicted first
+    AGENT_CACHE_MAX_ENTRIES: int = 100_000 # Entries kept on disk, least recently used evicted first; 0 for no limit
+    AGENT_CACHE_DEFAULT_TTL: int = 7 * 24 * 60 * 60 # Seconds; for cached LLM results, which have no TTL of their own
+    RETRIEVAL_CACHE_TTL: int = 24 * 60 * 60 # Seconds
+    RESEARCH_CACHE_TTL: int = 60 * 60 # Seconds; complete research results, keyed by the normalized query
+
+    # Token budget per summarization call before the summarizer switches to map-reduce
+    SUMMARY_CHUNK_TOKENS: int = 6000
+    # Retrieved text shorter than this (in characters) is returned verbatim as the summary, without an LLM call; 0 disables
+    SUMMARY_BYPASS_CHARS: int = 2000
+
+    # Deconstruct and plan in one LLM call; the plan is then drafted before retrieval
+    FUSED_PLANNING: bool = False
+
+    # Search the original query while it is being deconstructed (one extra Tavily call per request)
+    SPECULATIVE_RETRIEVAL: bool = False
+
+    # Open the Azure OpenAI and Tavily connections at startup (one single-token completion)
+    STARTUP_WARMUP: bool = True
+
+try:
+    settings = Settings()
+except ValidationError as e:
+    raise ValueError("Azure OpenAI credentials are not fully configured in .env file.") from e
+
+# The LLM clients (e.g., AzureChatOpenAI) are built lazily on first use and then
+# shared by all agents; they send their requests through the shared HTTP client.
+def _build_llm(temperature: float) -> AzureChatOpenAI:
+    from app.core.http import get_http_async_client # app.core.http reads settings from this module
+    return AzureChatOpenAI(
+        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+        api_key=settings.AZURE_OPENAI_API_KEY,
+        api_version=settings.AZURE_OPENAI_API_VERSION,
+        azure_deployment=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
+        temperature=temperature,
+        http_async_client=get_http_async_client(),
+        # max_tokens=1000 # Example: Set max tokens if needed
+    )
+
+# Structured Outputs (strict JSON schema responses) need this API version or later
+STRUCTURED_OUTPUTS_MIN_API_VERSION = "2024-08-01"
+
+def structured_output_options() -> dict:
+    """
+    Keyword arguments for with_structured_output. Strict JSON schema mode avoids sending
+    a tool definition with every call; older API versions fall back to function calling.
+    """
+    if settings.AZURE_OPENAI_API_VERSION[:10] >= STRUCTURED_OUTPUTS_MIN_API_VERSION:
+        return {"method": "json_schema", "strict": True}
+    return {"method": "function_calling"}
+
+@lru_cache(maxsize=1)
+def get_llm() -> AzureChatOpenAI:
+    """The general-purpose LLM client (temperature 0.7)."""
+    return _build_llm(temperature=0.7)
 
-llm = AzureChatOpenAI(
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-    api_key=AZURE_OPENAI_API_KEY,
-    api_version=AZURE_OPENAI_API_VERSION,
-    azure_deployment=AZURE_OPENAI_DEPLOYMENT_NAME,
-    temperature=0.7, # Default temperature
-    # max_tokens=1000 # Example: Set max tokens if needed
-)
+@lru_cache(maxsize=1)
+def get_deterministic_llm() -> AzureChatOpenAI:
+    """Used by the research agents, which need repeatable structured output."""
+    return _build_llm(temperature=0)
 
 # You can add other configurations here
@@ -0,0 +1,41 @@
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+from app.schemas.research_schemas import UserFeedback
+
+# Number of recent feedback entries kept in memory per log file
+RECENT_FEEDBACK_MAXLEN = 10000
+
+# Recently appended feedback, per log file, as (start_offset, end_offset, feedback).
+# FeedbackAgent fills it as it writes and FeedbackAnalyzerAgent reads new entries from
+# here instead of re-parsing the log; the file on disk stays the durable copy.
+# Offsets are only meaningful while this process is the log's only writer.
+_recent: Dict[str, Deque[Tuple[int, int, UserFeedback]]] = {}
+_lock = threading.Lock()
+
+def _buffer(log_path: str) -> Deque[Tuple[int, int, UserFeedback]]:
+    return _recent.setdefault(os.path.abspath(log_path), deque(maxlen=RECENT_FEEDBACK_MAXLEN))
+
+def post_append(log_path: str, start_offset: int, end_offset: int, feedback: UserFeedback):
+    """Called by FeedbackAgent after writing `feedback` at [start_offset, end_offset) of the log."""
+    with _lock:
+        _buffer(log_path).append((start_offset, end_offset, feedback))
+
+def entries_since(log_path: str, offset: int) -> List[Tuple[int, UserFeedback]] | None:
+    """
+    Returns the entries written at or after byte `offset` as (end_offset, feedback),
+    or None when the buffer does not reach back to `offset` (e.g. on a cold start)
+    and the log has to be read from disk instead.
+    """
+    with _lock:
+        recent = _buffer(log_path)
+        if not recent or recent[0][0] > offset or recent[-1][1] < offset:
+            return None
+        if recent[-1][1] == offset:
+            return []
+        entries = [(end, feedback) for start, end, feedback in recent if start >= offset]
+        if recent[-len(entries)][0] != offset:
+            return None # `offset` is not the start of a buffered entry
+        return entries
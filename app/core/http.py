@@ -0,0 +1,25 @@
+from functools import lru_cache
+
+import httpx
+
+from app.core.config import settings
+
+# A single async HTTP client for the whole process. The Azure OpenAI clients and the
+# Tavily searches both go through it, so TCP/TLS connections are opened once and then
+# kept alive (and multiplexed over HTTP/2) instead of being set up again for every call.
+@lru_cache(maxsize=1)
+def get_http_async_client() -> httpx.AsyncClient:
+    # In-flight calls are capped by the semaphores in app/core/limits.py, so the pool never
+    # needs more connections than that, and all of them are worth keeping alive
+    max_connections = settings.AZURE_MAX_PARALLEL + settings.TAVILY_MAX_PARALLEL
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=30,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    )
+
+async def aclose_http_client():
+    """Closes the shared client, if it was created. Called on application shutdown."""
+    if get_http_async_client.cache_info().currsize:
+        await get_http_async_client().aclose()
+        get_http_async_client.cache_clear()
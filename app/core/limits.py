@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, List
+from langchain_core.runnables import Runnable, RunnableLambda
+from openai import RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+from app.core.config import settings
+
+# Process-wide caps on in-flight calls, shared by every agent.
+azure_sem = asyncio.Semaphore(settings.AZURE_MAX_PARALLEL)
+tavily_sem = asyncio.Semaphore(settings.TAVILY_MAX_PARALLEL)
+
+@retry(
+    wait=wait_exponential_jitter(1, 30),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception_type(RateLimitError),
+    reraise=True
+)
+async def ainvoke_azure(runnable, inputs):
+    """
+    Invokes an Azure OpenAI-backed runnable under azure_sem.
+    Rate-limit errors are retried with exponential backoff; the semaphore is
+    released while waiting so other calls can proceed.
+    """
+    async with azure_sem:
+        return await runnable.ainvoke(inputs)
+
+async def ainvoke_tavily(search_tool, query: str):
+    """Invokes the Tavily search tool under tavily_sem."""
+    async with tavily_sem:
+        return await search_tool.ainvoke(query)
+
+async def abatch_azure(runnable: Runnable, inputs: List[Any], max_concurrency: int = settings.AZURE_MAX_PARALLEL) -> List[Any]:
+    """
+    Batch counterpart of ainvoke_azure built on Runnable.abatch.
+    max_concurrency caps this batch; every call still goes through azure_sem and backoff.
+    """
+    async def invoke(item):
+        return await ainvoke_azure(runnable, item)
+    return await RunnableLambda(invoke).abatch(inputs, config={"max_concurrency": max_concurrency})
+
+async def abatch_tavily(search_tool: Runnable, queries: List[str], max_concurrency: int = settings.TAVILY_MAX_PARALLEL) -> List[Any]:
+    """
+    Batch counterpart of ainvoke_tavily built on Runnable.abatch.
+    A failed query yields its exception in place of its result.
+    """
+    async def invoke(query):
+        return await ainvoke_tavily(search_tool, query)
+    return await RunnableLambda(invoke).abatch(queries, config={"max_concurrency": max_concurrency}, return_exceptions=True)
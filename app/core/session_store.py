@@ -0,0 +1,111 @@
+import asyncio
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_DIR = Path(__file__).resolve().parents[2] / "sessions"
+SESSIONS_DB = SESSIONS_DIR / "sessions.db"
+
+def is_session_filename(name: str) -> bool:
+    return name.startswith("session_") and name.endswith(".json")
+
+def new_session_id() -> str:
+    # Same shape as the legacy per-session file names, so old and new ids sort and look alike
+    return f"session_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json"
+
+class SessionStore:
+    """
+    Research sessions persisted as rows of a single SQLite database, instead of
+    one JSON file per session. Listing is an indexed query on created_at and
+    lookups go through the primary key. Blocking SQLite calls run in a worker
+    thread so they don't stall the event loop.
+    """
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Called with the lock held; the database is opened on first use
+        if self._conn is None:
+            os.makedirs(self.db_path.parent, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, created_at TEXT NOT NULL, state_json BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_created_at ON sessions (created_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def import_legacy_files(self):
+        """
+        Copies session_*.json files written by earlier versions into the database.
+        Already imported files are skipped; the files themselves are left in place.
+        Blocking; call it via asyncio.to_thread.
+        """
+        try:
+            with os.scandir(self.db_path.parent) as entries:
+                paths = [entry.path for entry in entries if is_session_filename(entry.name) and entry.is_file()]
+        except FileNotFoundError:
+            return
+        rows = []
+        for path in paths:
+            name = os.path.basename(path)
+            try:
+                with open(path, "rb") as f:
+                    state_json = f.read()
+                created_at = datetime.datetime.strptime(name[len("session_"):-len(".json")], "%Y%m%d_%H%M%S_%f")
+            except (OSError, ValueError) as e:
+                logger.warning("Skipping legacy session file %s: %s", name, e)
+                continue
+            rows.append((name, created_at.isoformat(), state_json))
+        with self._lock:
+            conn = self._connect()
+            imported = conn.executemany(
+                "INSERT OR IGNORE INTO sessions (id, created_at, state_json) VALUES (?, ?, ?)", rows
+            ).rowcount
+            conn.commit()
+        if imported > 0:
+            logger.info("Imported %d legacy session files into %s", imported, self.db_path)
+
+    def _add(self, session_id: str, state_json: bytes):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO sessions (id, created_at, state_json) VALUES (?, ?, ?)",
+                (session_id, datetime.datetime.now().isoformat(), state_json)
+            )
+            conn.commit()
+
+    def _newest_first(self, offset: int, limit: int) -> List[str]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id FROM sessions ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _get(self, session_id: str) -> bytes | None:
+        with self._lock:
+            row = self._connect().execute("SELECT state_json FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return None if row is None else row[0]
+
+    async def add(self, session_id: str, state_json: bytes):
+        await asyncio.to_thread(self._add, session_id, state_json)
+
+    async def newest_first(self, offset: int = 0, limit: int = 50) -> List[str]:
+        """Returns one page of session ids, newest first."""
+        return await asyncio.to_thread(self._newest_first, offset, limit)
+
+    async def get(self, session_id: str) -> bytes | None:
+        """Returns the stored JSON of a session, or None if there is no such session."""
+        return await asyncio.to_thread(self._get, session_id)
+
+session_store = SessionStore(SESSIONS_DB)
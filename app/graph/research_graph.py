@@ -1,211 +1,280 @@
-import json # Added for session persistence
-import os # Added for session persistence
-import datetime # Added for session persistence
-from typing import TypedDict, List, Dict, Any
+import asyncio
+import contextlib
+import logging
+from dataclasses import dataclass, fields, replace
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, ClassVar
+from langchain_core.runnables import RunnableConfig
+from pydantic import TypeAdapter
 from langgraph.graph import StateGraph, END
+from langgraph.graph.state import CompiledStateGraph
 
 from app.agents.deconstructor_agent import QueryDeconstructorAgent, DeconstructedQueries
-from app.agents.retriever_agent import InformationRetrieverAgent
+from app.agents.planner_deconstructor_agent import PlannerDeconstructorAgent, DeconstructedPlan
+from app.agents.retriever_agent import InformationRetrieverAgent, is_retrieval_error, is_usable_information
 from app.agents.planner_agent import PlannerAgent, ResearchPlan
 from app.agents.summarizer_agent import SummarizerAgent, SummarizedOutput # Added import
+from app.core.cache import agent_cache, bypass_cache, make_key
+from app.core.config import settings
+from app.core.session_store import new_session_id, session_store
 
-# Define the state for our graph
-class ResearchGraphState(TypedDict):
+logger = logging.getLogger(__name__)
+
+# Define the state for our graph. Nodes read it as attributes and return only the
+# fields they change, which LangGraph merges into a new instance for the next node.
+@dataclass(slots=True)
+class ResearchGraphState:
     original_query: str
-    deconstructed_queries: List[str] | None
-    retrieved_information: Dict[str, str] | None # Maps sub_query to retrieved_info
-    plan: ResearchPlan | None
-    summary: SummarizedOutput | None # Added summary state
-    error: str | None
+    deconstructed_queries: List[str] | None = None
+    retrieved_information: Dict[str, str] | None = None # Maps sub_query to retrieved_info
+    has_usable_info: bool | None = None # Whether any retrieved entry holds actual content, classified at retrieval time
+    prefetched_information: Dict[str, str] | None = None # Speculative search on the original query (SPECULATIVE_RETRIEVAL)
+    plan: ResearchPlan | None = None
+    summary: SummarizedOutput | None = None # Added summary state
+    error: str | None = None
+    next: str | None = None # Set by each node to the node that should run after it
+
+# Last stage yielded by ResearchGraph.stream, together with the final state
+STREAM_DONE = "done"
+
+# Serializes the whole state, nested Pydantic models included, in one pydantic-core pass
+_state_adapter = TypeAdapter(ResearchGraphState)
+
+_STATE_FIELDS = tuple(field.name for field in fields(ResearchGraphState))
+
+def _filled_fields(state: ResearchGraphState) -> List[str]:
+    """Names of the state fields that hold a value, for debug logging."""
+    return [name for name in _STATE_FIELDS if getattr(state, name) is not None]
+
+NodeMethod = Callable[["ResearchGraph", ResearchGraphState], Awaitable[Dict[str, Any]]]
+
+def _instance_node(method: NodeMethod):
+    """
+    Wraps an unbound ResearchGraph node method so the shared compiled graph
+    runs it on the instance passed in the run config.
+    """
+    async def node(state: ResearchGraphState, config: RunnableConfig) -> Dict[str, Any]:
+        return await method(config["configurable"]["research_graph"], state)
+    node.__name__ = method.__name__
+    return node
 
 class ResearchGraph:
-    def __init__(self):
-        self.query_deconstructor = QueryDeconstructorAgent()
-        self.info_retriever = InformationRetrieverAgent()
-        self.planner = PlannerAgent()
-        self.summarizer = SummarizerAgent() # Initialize summarizer
-        self.graph = self._build_graph()
-        self.sessions_dir = os.path.join(os.path.dirname(__file__), "..", "..", "sessions") # Define sessions directory
-        if not os.path.exists(self.sessions_dir):
-            os.makedirs(self.sessions_dir)
-
-    async def _deconstruct_node(self, state: ResearchGraphState) -> ResearchGraphState:
-        print(f"---NODE: DECONSTRUCTING QUERY--- Input state: {state}")
+    # Compiled once and shared by all instances; see _get_compiled_graph
+    _compiled_graph: ClassVar[CompiledStateGraph | None] = None
+
+    def __init__(
+        self,
+        query_deconstructor: QueryDeconstructorAgent | None = None,
+        info_retriever: InformationRetrieverAgent | None = None,
+        planner: PlannerAgent | None = None,
+        summarizer: SummarizerAgent | None = None,
+        planner_deconstructor: PlannerDeconstructorAgent | None = None,
+    ):
+        # Agents can be passed in (e.g. fakes in tests); otherwise the defaults are built here
+        self.query_deconstructor = query_deconstructor or QueryDeconstructorAgent()
+        self.info_retriever = info_retriever or InformationRetrieverAgent()
+        self.planner = planner or PlannerAgent()
+        self.summarizer = summarizer or SummarizerAgent() # Initialize summarizer
+        # When enabled, the plan is drafted together with the deconstruction and the planner node is skipped
+        if planner_deconstructor is None and settings.FUSED_PLANNING:
+            planner_deconstructor = PlannerDeconstructorAgent()
+        self.planner_deconstructor = planner_deconstructor
+        self.graph = self._get_compiled_graph()
+        # Runs in progress by response cache key; resolved with the final state (None if it failed)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _start_warmup(self, query: str) -> asyncio.Task | None:
+        """Speculatively searches the original query while it is being deconstructed."""
+        if not settings.SPECULATIVE_RETRIEVAL or not self.info_retriever.search_tool:
+            return None
+        return asyncio.create_task(self.info_retriever.retrieve_information(query))
+
+    async def _collect_warmup(self, warmup_task: asyncio.Task | None, query: str, sub_queries: List[str]) -> Dict[str, str] | None:
+        """
+        Returns the warmup result keyed by the sub-query it answers: one equal to the
+        original query, or else a single sub-query, which is a rephrasing of it. Results
+        that answer no sub-query are dropped (and their search cancelled), so they never
+        show up as a sub-query of their own.
+        """
+        if warmup_task is None:
+            return None
+        normalized_query = query.strip().casefold()
+        matching = [sub_query for sub_query in sub_queries if sub_query.strip().casefold() == normalized_query]
+        if not matching and len(sub_queries) == 1:
+            matching = sub_queries
+        if not matching:
+            warmup_task.cancel()
+            return None
+        info = await warmup_task
+        if not is_usable_information(info):
+            return None # The sub-query is searched on its own instead
+        return {matching[0]: info}
+
+    async def _deconstruct_node(self, state: ResearchGraphState) -> Dict[str, Any]:
+        logger.debug("---NODE: DECONSTRUCTING QUERY--- Filled fields: %s", _filled_fields(state))
+        # The first Tavily round-trip overlaps the deconstruction LLM call
+        warmup_task = self._start_warmup(state.original_query)
         try:
-            deconstructed_output: DeconstructedQueries = await self.query_deconstructor.deconstruct_query(state["original_query"])
-            updated_state = {**state, "deconstructed_queries": deconstructed_output.queries, "error": None}
-            print(f"---NODE: DECONSTRUCT FINISHED--- Output state partial: {{'deconstructed_queries': {deconstructed_output.queries}, 'error': None}}")
+            if self.planner_deconstructor is not None:
+                fused_output: DeconstructedPlan = await self.planner_deconstructor.deconstruct_and_plan(state.original_query)
+                plan = ResearchPlan(plan_steps=fused_output.plan_steps, synthesis_questions=fused_output.synthesis_questions)
+                prefetched = await self._collect_warmup(warmup_task, state.original_query, fused_output.queries)
+                updated_state = {"deconstructed_queries": fused_output.queries, "prefetched_information": prefetched, "plan": plan, "error": None, "next": "retrieve_information"}
+                logger.debug("---NODE: DECONSTRUCT FINISHED--- Output: %s", updated_state)
+                return updated_state
+
+            deconstructed_output: DeconstructedQueries = await self.query_deconstructor.deconstruct_query(state.original_query)
+            prefetched = await self._collect_warmup(warmup_task, state.original_query, deconstructed_output.queries)
+            updated_state = {"deconstructed_queries": deconstructed_output.queries, "prefetched_information": prefetched, "error": None, "next": "retrieve_information"}
+            logger.debug("---NODE: DECONSTRUCT FINISHED--- Output: %s", updated_state)
             return updated_state
         except Exception as e:
-            print(f"Error in deconstruction: {e}")
-            updated_state = {**state, "error": f"Failed to deconstruct query: {e}"}
-            print(f"---NODE: DECONSTRUCT ERRORED--- Output state partial: {{'error': '{updated_state['error']}'}}")
+            if warmup_task is not None:
+                warmup_task.cancel()
+            logger.error("Error in deconstruction: %s", e)
+            updated_state = {"error": f"Failed to deconstruct query: {e}", "next": "error_handler"}
+            logger.debug("---NODE: DECONSTRUCT ERRORED--- Output: %s", updated_state)
             return updated_state
 
-    async def _retrieval_node(self, state: ResearchGraphState) -> ResearchGraphState:
-        print(f"---NODE: RETRIEVING INFORMATION--- Input state: {state}")
-        if state.get("error"): # If deconstruction failed, skip
-            print("---NODE: RETRIEVAL SKIPPED DUE TO PREVIOUS ERROR---")
-            return state
+    async def _retrieval_node(self, state: ResearchGraphState) -> Dict[str, Any]:
+        logger.debug("---NODE: RETRIEVING INFORMATION--- Filled fields: %s", _filled_fields(state))
+        if state.error: # If deconstruction failed, skip
+            logger.info("---NODE: RETRIEVAL SKIPPED DUE TO PREVIOUS ERROR---")
+            return {"next": "error_handler"}
         
         all_retrieved_info = {}
+        has_usable_info = False
         sub_query_errors = []
-        if state.get("deconstructed_queries"):
-            for sub_query in state["deconstructed_queries"]:
-                try:
-                    print(f"Retrieving for: {sub_query}")
-                    info = await self.info_retriever.retrieve_information(sub_query)
+        if state.deconstructed_queries:
+            logger.info("Retrieving for %d sub-queries concurrently", len(state.deconstructed_queries))
+            prefetched = state.prefetched_information or {}
+            results = await self.info_retriever.retrieve_many(state.deconstructed_queries, prefetched=prefetched)
+            if agent_cache is not None:
+                logger.info("Agent cache after retrieval: %(hits)d hits, %(misses)d misses, %(memory_entries)d entries in memory", agent_cache.stats())
+            for sub_query, info in results.items():
+                if isinstance(info, Exception):
+                    logger.error("Error retrieving for %s: %s", sub_query, info)
+                    all_retrieved_info[sub_query] = f"Failed to retrieve information: {info}"
+                    sub_query_errors.append(f"For '{sub_query}': {info}")
+                else:
                     all_retrieved_info[sub_query] = info
-                except Exception as e:
-                    print(f"Error retrieving for {sub_query}: {e}")
-                    all_retrieved_info[sub_query] = f"Failed to retrieve information: {e}"
-                    sub_query_errors.append(f"For '{sub_query}': {e}")
+                    has_usable_info = has_usable_info or is_usable_information(info)
             
-            current_error = state.get("error")
+            current_error = state.error
             if sub_query_errors:
                 new_error_message = f"Errors during retrieval: {'; '.join(sub_query_errors)}"
                 updated_error = f"{current_error}; {new_error_message}" if current_error else new_error_message
             else:
                 updated_error = current_error
 
-            updated_state = {**state, "retrieved_information": all_retrieved_info, "error": updated_error}
-            print(f"---NODE: RETRIEVAL FINISHED--- Output state partial: {{'retrieved_information': {all_retrieved_info}, 'error': {updated_error}}}")
+            updated_state = {
+                "retrieved_information": all_retrieved_info,
+                "has_usable_info": has_usable_info,
+                "error": updated_error,
+                "next": "error_handler" if updated_error else "plan_and_summarize"
+            }
+            logger.debug("---NODE: RETRIEVAL FINISHED--- Output: %s", updated_state)
             return updated_state
         else:
-            print("---NODE: RETRIEVAL - NO DECONSTRUCTED QUERIES---")
-            updated_state = {**state, "error": "No deconstructed queries to retrieve."}
-            print(f"---NODE: RETRIEVAL ERRORED--- Output state partial: {{'error': '{updated_state['error']}'}}")
+            logger.warning("---NODE: RETRIEVAL - NO DECONSTRUCTED QUERIES---")
+            updated_state = {"error": "No deconstructed queries to retrieve.", "next": "error_handler"}
+            logger.debug("---NODE: RETRIEVAL ERRORED--- Output: %s", updated_state)
             return updated_state
 
-    async def _planner_node(self, state: ResearchGraphState) -> ResearchGraphState:
-        print(f"---NODE: PLANNING--- Input state: {state}")
-        if state.get("error") or not state.get("original_query") or not state.get("deconstructed_queries") or not state.get("retrieved_information"):
-            print("---NODE: PLANNING SKIPPED DUE TO PREVIOUS ERROR OR MISSING DATA---")
-            # Ensure plan is None if skipped, and summary is also None as it depends on retrieved_information
-            return {**state, "plan": None, "summary": None} if "plan" not in state or "summary" not in state else state
+    async def _plan(self, state: ResearchGraphState) -> tuple[ResearchPlan | None, str | None]:
+        """Creates the research plan; returns it with an error message if planning failed."""
+        if not state.original_query or not state.deconstructed_queries or not state.retrieved_information:
+            logger.info("---PLANNING SKIPPED DUE TO MISSING DATA---")
+            return None, None
 
         try:
             plan_output: ResearchPlan = await self.planner.create_plan(
-                original_query=state["original_query"],
-                deconstructed_queries=state["deconstructed_queries"],
-                retrieved_information=state["retrieved_information"]
+                original_query=state.original_query,
+                deconstructed_queries=state.deconstructed_queries,
+                retrieved_information=state.retrieved_information
             )
-            updated_state = {**state, "plan": plan_output, "error": state.get("error")}
-            print(f"---NODE: PLANNING FINISHED--- Output state partial: {{'plan': {plan_output}}}")
-            return updated_state
+            logger.debug("---PLANNING FINISHED--- Plan: %s", plan_output)
+            return plan_output, None
         except Exception as e:
-            print(f"Error in planning: {e}")
-            current_error = state.get("error")
-            new_error_message = f"Failed to create plan: {e}"
-            updated_error = f"{current_error}; {new_error_message}" if current_error else new_error_message
-            # Ensure summary is also None if planning fails
-            updated_state = {**state, "plan": None, "summary": None, "error": updated_error}
-            print(f"---NODE: PLANNING ERRORED--- Output state partial: {{'plan': None, 'summary': None, 'error': '{updated_error}'}}")
-            return updated_state
+            logger.error("Error in planning: %s", e)
+            return None, f"Failed to create plan: {e}"
 
-    async def _summarizer_node(self, state: ResearchGraphState) -> ResearchGraphState:
-        print(f"---NODE: SUMMARIZING--- Input state: {state}")
-        # Summarizer should run even if planning failed, as long as retrieval was successful.
-        # However, if retrieval itself failed or produced no usable info, summarizer might not be useful.
-        if not state.get("retrieved_information") or not any(isinstance(info, str) and not info.startswith("Placeholder") and not info.startswith("Error retrieving") and not info.startswith("No content found") for info in state["retrieved_information"].values()):
-            print("---NODE: SUMMARIZING SKIPPED DUE TO MISSING OR INVALID RETRIEVED DATA---")
-            return {**state, "summary": SummarizedOutput(summary="No valid information was available to summarize.")}
+    async def _summarize(self, state: ResearchGraphState) -> tuple[SummarizedOutput, str | None]:
+        """Summarizes the retrieved information; returns the summary with an error message if summarization failed."""
+        # If retrieval produced no usable info, the summarizer wouldn't be useful.
+        if not state.retrieved_information or not state.has_usable_info:
+            logger.info("---SUMMARIZING SKIPPED DUE TO MISSING OR INVALID RETRIEVED DATA---")
+            return SummarizedOutput(summary="No valid information was available to summarize."), None
 
-        # If a critical error occurred before summarization (e.g. in deconstruction), we might also skip.
-        # For now, we rely on the check above for retrieved_information.
-        # An earlier error in the deconstruction or retrieval node that prevents useful information
-        # from being passed should lead to the "No valid information" summary.
+        # Short results are used as they are, without a summarization round-trip
+        summary_output = self.summarizer.verbatim_summary(state.retrieved_information)
+        if summary_output is not None:
+            logger.info("---SUMMARIZING SKIPPED: RETRIEVED INFORMATION IS ALREADY SHORT---")
+            return summary_output, None
 
         try:
-            summary_output: SummarizedOutput = await self.summarizer.summarize_information(
-                retrieved_information=state["retrieved_information"]
+            summary_output = await self.summarizer.summarize_information(
+                retrieved_information=state.retrieved_information
             )
-            # Preserve existing error, but add summary
-            updated_state = {**state, "summary": summary_output, "error": state.get("error")}
-            print(f"---NODE: SUMMARIZING FINISHED--- Output state partial: {{'summary': {summary_output}}}")
-            return updated_state
+            logger.debug("---SUMMARIZING FINISHED--- Summary: %s", summary_output)
+            return summary_output, None
         except Exception as e:
-            print(f"Error in summarization: {e}")
-            current_error = state.get("error")
-            new_error_message = f"Failed to summarize information: {e}"
-            updated_error = f"{current_error}; {new_error_message}" if current_error else new_error_message
-            updated_state = {**state, "summary": SummarizedOutput(summary=f"Failed to generate summary: {e}"), "error": updated_error}
-            print(f"---NODE: SUMMARIZING ERRORED--- Output state partial: {{'summary': {{'summary': '{updated_state['summary'].summary}'}}, 'error': '{updated_error}'}}")
-            return updated_state
+            logger.error("Error in summarization: %s", e)
+            return SummarizedOutput(summary=f"Failed to generate summary: {e}"), f"Failed to summarize information: {e}"
 
-    async def _error_handler_node(self, state: ResearchGraphState) -> ResearchGraphState:
-        print(f"---NODE: ERROR HANDLER--- Input state: {state}")
-        # This node currently just passes the state through.
-        # Session saving will occur in the main run method based on the final state.
-        return state
+    async def _plan_and_summarize_node(self, state: ResearchGraphState) -> Dict[str, Any]:
+        logger.debug("---NODE: PLANNING AND SUMMARIZING--- Filled fields: %s", _filled_fields(state))
+        # The plan and the summary both depend only on the retrieved information,
+        # so the two LLM calls run concurrently. Each one fails independently.
+        if state.plan is None:
+            (plan_output, plan_error), (summary_output, summary_error) = await asyncio.gather(
+                self._plan(state), self._summarize(state)
+            )
+        else:
+            # Plan already drafted during deconstruction (FUSED_PLANNING)
+            plan_output, plan_error = state.plan, None
+            summary_output, summary_error = await self._summarize(state)
 
-    def _should_continue(self, state: ResearchGraphState) -> str:
-        print(f"---LOGIC: SHOULD_CONTINUE--- Checking state: {state}")
+        # A planning error alone is not critical: the summary is still produced alongside it
+        updated_state = {"plan": plan_output, "summary": summary_output, "next": "error_handler" if summary_error else END}
+        if plan_error or summary_error:
+            updated_state["error"] = "; ".join(error for error in (state.error, plan_error, summary_error) if error)
+        logger.debug("---NODE: PLANNING AND SUMMARIZING FINISHED--- Output: %s", updated_state)
+        return updated_state
 
-        if state.get("error"):
-            # If an error is set by deconstruct, retrieve, or plan, and we haven't run summarizer yet,
-            # we might still want to run summarizer if there's some data.
-            # However, if the error is critical (e.g., from deconstruction), summarizer might not make sense.
-            # The current logic: if any error, go to error_handler. Error handler goes to END.
-            # Let's refine this: if error occurs in planner, we still go to summarizer.
-            # If error in deconstruct/retrieve, then error_handler.
+    async def _error_handler_node(self, state: ResearchGraphState) -> Dict[str, Any]:
+        logger.debug("---NODE: ERROR HANDLER--- Filled fields: %s", _filled_fields(state))
+        # This node currently leaves the state unchanged.
+        # Session saving will occur in the main run method based on the final state.
+        return {}
 
-            # Check if the error is from planner specifically
-            is_planner_error = state["error"] and "Failed to create plan" in state["error"]
-            
-            if not is_planner_error: # Critical error before or during planning (not planner itself)
-                 print(f"Critical error in state: {state['error']}. Routing to error_handler.")
-                 return "error_handler"
-            # If it's a planner error, we might still proceed to summarizer if data exists.
-            # The summarizer node itself will check if retrieved_information is usable.
-
-        # Deconstruction -> Retrieval
-        if state.get("deconstructed_queries") is not None and state.get("retrieved_information") is None:
-            print("Routing from deconstruction to retrieve_information.")
-            return "retrieve_information"
-
-        # Retrieval -> Planner
-        if state.get("retrieved_information") is not None and state.get("plan") is None:
-            print("Routing from retrieve_information to planner.")
-            return "planner"
-        
-        # Planner -> Summarizer
-        # This condition means planner has run (or attempted to run and set plan to None)
-        # and summarizer hasn't run yet.
-        if state.get("plan") is not None or (state.get("retrieved_information") is not None and state.get("plan") is None):
-            if state.get("summary") is None:
-                 print("Routing from planner (or after planner attempt) to summarizer.")
-                 return "summarizer"
-
-        # Summarizer -> END
-        if state.get("summary") is not None:
-            print("All steps done (deconstruction, retrieval, planning, summarization). Routing to END.")
-            return END
-        
-        # Fallback / Initial state before deconstruction (should be handled by entry point)
-        # Or if deconstruction failed silently (no queries, no error)
-        if state.get("deconstructed_queries") is None and not state.get("error"):
-            print("State suggests deconstruction hasn't run or failed silently. Routing to error_handler.")
-            # state["error"] = "Internal Error: Deconstruction did not produce queries or an error." # Avoid direct mutation
-            return "error_handler" 
+    @staticmethod
+    def _should_continue(state: ResearchGraphState) -> str:
+        # Each node names its successor in `next`, so routing is a single lookup
+        next_node = state.next or END
+        logger.debug("---LOGIC: SHOULD_CONTINUE--- Routing to %s", next_node)
+        return next_node
 
-        print(f"Warning: _should_continue reached an unexpected state configuration: {state}. Routing to END.")
-        return END
+    @classmethod
+    def _get_compiled_graph(cls) -> CompiledStateGraph:
+        # The graph's structure doesn't depend on the instance, so it is compiled only once
+        if cls._compiled_graph is None:
+            cls._compiled_graph = cls._build_graph()
+        return cls._compiled_graph
 
-    def _build_graph(self) -> StateGraph:
+    @classmethod
+    def _build_graph(cls) -> CompiledStateGraph:
         workflow = StateGraph(ResearchGraphState)
 
-        workflow.add_node("deconstruct_query", self._deconstruct_node)
-        workflow.add_node("retrieve_information", self._retrieval_node)
-        workflow.add_node("planner", self._planner_node)
-        workflow.add_node("summarizer", self._summarizer_node) # Added summarizer node
-        workflow.add_node("error_handler", self._error_handler_node)
+        workflow.add_node("deconstruct_query", _instance_node(cls._deconstruct_node))
+        workflow.add_node("retrieve_information", _instance_node(cls._retrieval_node))
+        workflow.add_node("plan_and_summarize", _instance_node(cls._plan_and_summarize_node)) # Planner and summarizer, run concurrently
+        workflow.add_node("error_handler", _instance_node(cls._error_handler_node))
 
         workflow.set_entry_point("deconstruct_query")
 
         workflow.add_conditional_edges(
             "deconstruct_query",
-            self._should_continue,
+            cls._should_continue,
             {
                 "retrieve_information": "retrieve_information",
                 "error_handler": "error_handler",
@@ -214,97 +283,142 @@ class ResearchGraph:
         )
         workflow.add_conditional_edges(
             "retrieve_information",
-            self._should_continue,
+            cls._should_continue,
              {
-                "planner": "planner",
+                "plan_and_summarize": "plan_and_summarize",
                 "error_handler": "error_handler",
                 # END: END # Should not happen
             }
         )
         workflow.add_conditional_edges(
-            "planner",
-            self._should_continue,
+            "plan_and_summarize",
+            cls._should_continue,
             {
-                "summarizer": "summarizer", # Route to summarizer
-                "error_handler": "error_handler" # If planner sets an error that _should_continue deems critical
-            }
-        )
-        workflow.add_conditional_edges(
-            "summarizer",
-            self._should_continue,
-            {
-                END: END, # Normal flow after summarizer
-                "error_handler": "error_handler" # If summarizer sets an error
+                END: END, # Normal flow, also when only planning failed
+                "error_handler": "error_handler" # If summarization sets an error
             }
         )
         workflow.add_edge("error_handler", END)
         
         return workflow.compile()
 
-    def _serialize_state(self, state: ResearchGraphState) -> Dict[str, Any]:
-        """Converts ResearchGraphState to a JSON-serializable dictionary."""
-        serialized_state = {}
-        for key, value in state.items():
-            if hasattr(value, 'model_dump'): # For Pydantic models like ResearchPlan, SummarizedOutput
-                serialized_state[key] = value.model_dump()
-            elif isinstance(value, (list, dict, str, int, float, bool, type(None))):
-                serialized_state[key] = value
-            else:
-                # For other types, convert to string or handle as needed
-                serialized_state[key] = str(value)
-        return serialized_state
+    def _response_cache_key(self, query: str) -> str:
+        # Queries differing only in case or whitespace share an entry
+        normalized_query = " ".join(query.split()).casefold()
+        return make_key("research", normalized_query, settings.AZURE_OPENAI_DEPLOYMENT_NAME, settings.FUSED_PLANNING)
 
     async def _save_session(self, state: ResearchGraphState):
-        """Saves the research session state to a JSON file."""
-        if state.get("error") and "Critical error during graph execution" in state["error"]:
-            print("---SESSION SAVING SKIPPED due to critical graph execution error---")
+        """Saves the research session state to the session store."""
+        if state.error and "Critical error during graph execution" in state.error:
+            logger.info("---SESSION SAVING SKIPPED due to critical graph execution error---")
             return
 
         try:
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            session_filename = f"session_{timestamp}.json"
-            session_filepath = os.path.join(self.sessions_dir, session_filename)
-
-            # Prepare state for JSON serialization
-            # Pydantic models (plan, summary) need to be dumped to dicts
-            serializable_state = self._serialize_state(state)
-
-            with open(session_filepath, 'w') as f:
-                json.dump(serializable_state, f, indent=4)
-            print(f"---SESSION SAVED to {session_filepath}---")
+            session_id = new_session_id()
+            # Serialize in a worker thread so the event loop isn't blocked
+            state_json = await asyncio.to_thread(_state_adapter.dump_json, state)
+            await session_store.add(session_id, state_json)
+            logger.info("---SESSION SAVED as %s---", session_id)
         except Exception as e:
-            print(f"Error saving session: {e}")
+            logger.error("Error saving session: %s", e)
 
 
-    async def run(self, query: str) -> ResearchGraphState:
+    async def run(self, query: str, cache_bypass: bool = False) -> ResearchGraphState:
         """
         Executes the research graph with the given query and saves the session.
+        Successful results are cached by normalized query; `cache_bypass` forces a
+        fresh run (skipping every cache read) and refreshes the cached result.
+        """
+        # Closed here rather than by the event loop's finalizer, so its cleanup runs in this context
+        async with contextlib.aclosing(self.stream(query, cache_bypass=cache_bypass)) as stream:
+            async for stage, update in stream:
+                if stage == STREAM_DONE:
+                    return update
+
+    async def stream(self, query: str, cache_bypass: bool = False) -> AsyncIterator[tuple[str, Any]]:
         """
-        initial_inputs = {
-            "original_query": query,
-            "deconstructed_queries": None,
-            "retrieved_information": None,
-            "plan": None,
-            "summary": None, # Added summary to initial inputs
-            "error": None
-        }
-        print(f"---GRAPH INVOKING--- Initial inputs: {initial_inputs}")
+        Like run, but yields (node name, fields the node changed) as each node finishes,
+        and finally (STREAM_DONE, final state). A cached result yields only the final state,
+        and so does a query that joins an identical run already in progress.
+        """
+        key = self._response_cache_key(query)
+        token = bypass_cache.set(cache_bypass)
+        try:
+            if agent_cache is not None:
+                cached = await agent_cache.get(key)
+                if cached is not None:
+                    logger.info("---RESPONSE CACHE HIT--- for query: %s", query)
+                    final_state = replace(_state_adapter.validate_json(cached), original_query=query)
+                    await self._save_session(final_state)
+                    yield STREAM_DONE, final_state
+                    return
+
+            # A double-submitted query (or the same one from another tab) waits for the run
+            # already in progress instead of starting another; it runs on its own if that one fails
+            inflight = None if cache_bypass else self._inflight.get(key)
+            if inflight is not None:
+                logger.info("---JOINING IN-FLIGHT RUN--- for query: %s", query)
+                shared_state = await asyncio.shield(inflight)
+                if shared_state is not None:
+                    final_state = replace(shared_state, original_query=query)
+                    await self._save_session(final_state)
+                    yield STREAM_DONE, final_state
+                    return
+
+            done = asyncio.get_running_loop().create_future()
+            self._inflight.setdefault(key, done)
+            try:
+                async for stage, update in self._stream_graph(query):
+                    if stage != STREAM_DONE:
+                        yield stage, update
+                        continue
+                    final_state = update
+                    if not final_state.error:
+                        done.set_result(final_state)
+                        # A run whose searches failed is shared but not cached, so the next one searches again
+                        failed_search = any(is_retrieval_error(info) for info in (final_state.retrieved_information or {}).values())
+                        if agent_cache is not None and not failed_search:
+                            await agent_cache.set(
+                                key,
+                                _state_adapter.dump_json(final_state).decode(),
+                                ttl=settings.RESEARCH_CACHE_TTL
+                            )
+                    yield STREAM_DONE, final_state
+            finally:
+                # Also reached when the client goes away mid-run; waiting callers then run on their own
+                if not done.done():
+                    done.set_result(None)
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+        finally:
+            bypass_cache.reset(token)
+
+    async def _stream_graph(self, query: str) -> AsyncIterator[tuple[str, Any]]:
+        initial_inputs = ResearchGraphState(original_query=query) # Other fields start as None
+        logger.info("---GRAPH INVOKING--- Query: %s", query)
         final_state_from_graph: ResearchGraphState
         try:
+            # Nodes only change the fields they return, so merging every update gives the final state
+            final_values: Dict[str, Any] = {}
             # Ensure a recursion limit, default is 25, can be adjusted.
-            final_state_from_graph = await self.graph.ainvoke(initial_inputs, config={"recursion_limit": 15})
-            print(f"---GRAPH INVOKE FINISHED--- Final state from graph.ainvoke: {final_state_from_graph}")
+            async for step in self.graph.astream(
+                initial_inputs,
+                config={"recursion_limit": 15, "configurable": {"research_graph": self}},
+                stream_mode="updates",
+            ):
+                for node_name, update in step.items():
+                    update = update or {}
+                    final_values.update(update)
+                    yield node_name, update
+            final_state_from_graph = replace(initial_inputs, **final_values)
+            logger.debug("---GRAPH INVOKE FINISHED--- Final state from graph.astream: %s", final_state_from_graph)
         except Exception as e:
-            print(f"Exception during graph.ainvoke: {e}")
-            # Fallback state in case of unexpected error from ainvoke itself
-            final_state_from_graph = {
-                "original_query": query,
-                "deconstructed_queries": None,
-                "retrieved_information": None,
-                "plan": None,
-                "summary": None, 
-                "error": f"Critical error during graph execution: {str(e)}"
-            }
+            logger.error("Exception during graph.astream: %s", e)
+            # Fallback state in case of unexpected error from astream itself
+            final_state_from_graph = ResearchGraphState(
+                original_query=query,
+                error=f"Critical error during graph execution: {str(e)}"
+            )
         
         await self._save_session(final_state_from_graph) # Save session after graph execution
-        return final_state_from_graph
+        yield STREAM_DONE, final_state_from_graph
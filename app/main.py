@@ -1,20 +1,33 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from app.schemas.research_schemas import ResearchRequest, ResearchResponse, UserFeedback
-from app.graph.research_graph import ResearchGraph, ResearchGraphState
+from app.graph.research_graph import ResearchGraph, ResearchGraphState, STREAM_DONE
 from app.agents.feedback_agent import FeedbackAgent
 from app.agents.feedback_analyzer_agent import FeedbackAnalyzerAgent # Added
+from app.core.config import settings
+from app.core.http import aclose_http_client, get_http_async_client
+from app.core.session_store import session_store
 from app.schemas.research_schemas import FeedbackAnalysisResult # Added
-import os
-import json
-from pathlib import Path
+from langchain_community.utilities.tavily_search import TAVILY_API_URL
+from pydantic import TypeAdapter
+from typing import Any, Dict, List, Optional
 import asyncio
+import contextlib
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="AI Research Advisor API",
     description="API for the AI Research Advisor application using LangGraph.",
     version="0.1.0"
 )
+# Research results and sessions carry whole retrieved snippets; larger responses are
+# gzipped for clients that accept it (requests, used by the UI, always does)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 # Initialize the graph. Consider how to manage its lifecycle if it's resource-intensive.
 # For simple cases, a global instance is fine. For production, consider dependency injection.
@@ -22,55 +35,111 @@ research_graph_instance = ResearchGraph()
 feedback_agent_instance = FeedbackAgent() # Added
 feedback_analyzer_agent = FeedbackAnalyzerAgent() # Added
 
-SESSIONS_DIR = Path(__file__).resolve().parent.parent / "sessions"
+async def _warm_up_connections():
+    """
+    Opens the shared HTTP client's connections before the first request, so it doesn't pay
+    for DNS, TLS and auth: a single-token completion for Azure OpenAI (all agents share the
+    client) and a HEAD request for Tavily, which isn't counted as a search.
+    """
+    calls = {"Azure OpenAI": research_graph_instance.query_deconstructor.llm.ainvoke("ping", max_tokens=1)}
+    if research_graph_instance.info_retriever.search_tool:
+        calls["Tavily"] = get_http_async_client().head(TAVILY_API_URL)
+    results = await asyncio.gather(*calls.values(), return_exceptions=True)
+    for service, result in zip(calls, results):
+        if isinstance(result, Exception):
+            # Not fatal: the first request will connect (and fail, if misconfigured) on its own
+            logger.warning("Warmup of %s failed: %s", service, result)
+    logger.info("Warmed up %d of %d connections", sum(not isinstance(result, Exception) for result in results), len(results))
 
 @app.on_event("startup")
 async def startup_event():
     # You can add any startup logic here, e.g., pre-loading models if not done in agents
-    print("FastAPI application startup...")
-    # Test Azure OpenAI connection (optional, config already checks for vars)
-    try:
-        # A lightweight test, e.g., trying to initialize one of the LLMs from an agent
-        _ = research_graph_instance.query_deconstructor.llm 
-        print("Azure OpenAI client seems configured.")
-    except Exception as e:
-        print(f"Error during startup related to Azure OpenAI config: {e}")
-        # You might choose to raise an error here to prevent startup if critical
+    logger.info("FastAPI application startup...")
+    # Move session files written by earlier versions into the session database
+    await asyncio.to_thread(session_store.import_legacy_files)
+    # Also tests the Azure OpenAI configuration with a real call
+    if settings.STARTUP_WARMUP:
+        await _warm_up_connections()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Write out any queued feedback before the process exits
+    await feedback_agent_instance.flush()
+    # Close the HTTP client shared by the Azure OpenAI and Tavily calls
+    await aclose_http_client()
         
 @app.post("/research/", response_model=ResearchResponse)
-async def conduct_research(request: ResearchRequest):
+async def conduct_research(request: ResearchRequest, nocache: bool = False):
     """
     Endpoint to conduct research based on a user query.
     It runs the query through the LangGraph research pipeline.
+    Pass `?nocache=1` to ignore cached results and refresh them.
     """
     try:
-        print(f"Received research request for query: {request.query}")
+        logger.info("Received research request for query: %s", request.query)
         # The graph's run method is async
-        final_state: ResearchGraphState = await research_graph_instance.run(query=request.query)
+        final_state: ResearchGraphState = await research_graph_instance.run(query=request.query, cache_bypass=nocache)
         
-        print(f"Graph execution finished. Final state: {final_state}")
+        logger.debug("Graph execution finished. Final state: %s", final_state)
 
-        if final_state.get("error"):
+        if final_state.error:
              # You might want to map specific errors to HTTP status codes
-            raise HTTPException(status_code=500, detail=f"Error during research: {final_state['error']}")
-
-        # Construct the response based on the final state
-        # This assumes your ResearchGraphState directly maps or contains the fields for ResearchResponse
-        response_data = ResearchResponse(
-            original_query=final_state.get("original_query", request.query), # Falls back to request.query
-            deconstructed_queries=final_state.get("deconstructed_queries", []),
-            retrieved_information=final_state.get("retrieved_information", {}),
-            plan=final_state.get("plan"), # Pass plan to response
-            summary=final_state.get("summary") # Pass summary to response
-        )
-        return response_data
+            raise HTTPException(status_code=500, detail=f"Error during research: {final_state.error}")
+
+        return _research_response(final_state, request.query)
 
     except HTTPException as http_exc:
         raise http_exc # Re-raise HTTPException
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        logger.exception("An unexpected error occurred: %s", e)
         raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {str(e)}")
 
+def _research_response(final_state: ResearchGraphState, query: str) -> ResearchResponse:
+    # Construct the response based on the final state
+    # This assumes your ResearchGraphState directly maps or contains the fields for ResearchResponse
+    return ResearchResponse(
+        original_query=final_state.original_query or query, # Falls back to the request's query
+        deconstructed_queries=final_state.deconstructed_queries,
+        retrieved_information=final_state.retrieved_information,
+        plan=final_state.plan, # Pass plan to response
+        summary=final_state.summary # Pass summary to response
+    )
+
+# State fields sent to clients as the nodes produce them; the rest are internal to the graph
+_STREAMED_FIELDS = frozenset(ResearchResponse.model_fields) | {"error"}
+_event_adapter = TypeAdapter(Dict[str, Any])
+
+def _sse_event(event: Dict[str, Any]) -> bytes:
+    return b"data: " + _event_adapter.dump_json(event) + b"\n\n"
+
+@app.post("/research/stream/")
+async def conduct_research_stream(request: ResearchRequest, nocache: bool = False):
+    """
+    Same as /research/, but streamed as Server-Sent Events so clients can show each
+    stage as soon as it is ready. Every event is `{"stage": <node name>, "data": {...}}`
+    with the response fields that node produced; the last one has stage "done" and the
+    full ResearchResponse, or stage "error" and the error message.
+    """
+    async def events():
+        try:
+            # Closed here even if the client goes away mid-stream, so the graph's cleanup
+            # runs in this context rather than in the event loop's finalizer
+            async with contextlib.aclosing(research_graph_instance.stream(query=request.query, cache_bypass=nocache)) as updates:
+                async for stage, update in updates:
+                    if stage == STREAM_DONE:
+                        if update.error:
+                            yield _sse_event({"stage": "error", "error": f"Error during research: {update.error}"})
+                        else:
+                            yield _sse_event({"stage": STREAM_DONE, "data": _research_response(update, request.query)})
+                        continue
+                    data = {field: value for field, value in update.items() if field in _STREAMED_FIELDS and value is not None}
+                    if data:
+                        yield _sse_event({"stage": stage, "data": data})
+        except Exception as e:
+            logger.error("Error while streaming research for %s: %s", request.query, e)
+            yield _sse_event({"stage": "error", "error": f"An unexpected server error occurred: {str(e)}"})
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 # New Feedback Endpoint
 @app.post("/feedback/", status_code=201) # 201 for successful creation
 async def submit_feedback(feedback_data: UserFeedback):
@@ -78,23 +147,12 @@ async def submit_feedback(feedback_data: UserFeedback):
     Endpoint to receive and record user feedback.
     """
     try:
-        print(f"Received feedback: {feedback_data.model_dump_json(indent=2)}")
-        # The FeedbackAgent's record_feedback method is synchronous in the current simple implementation
-        # If it were async, you'd await it.
-        # For this simple file logging, running it synchronously in a thread pool executor
-        # might be an option for a production FastAPI app to avoid blocking the event loop,
-        # but for now, direct call is fine given its simplicity.
-        
+        logger.debug("Received feedback: %s", feedback_data)
+        # record_feedback queues the entry for the agent's background writer and
+        # returns once the batch containing it has been written and fsynced.
         # We are directly passing the UserFeedback model which now includes the timestamp
         # The agent will just log it.
-        # A more robust agent might generate the timestamp itself if not provided.
-        
-        # Let's adjust the agent to take the full UserFeedback object or create one if not given full
-        # For now, let's assume the agent's record_feedback is simplified or we adapt.
-        # The current FeedbackAgent.record_feedback expects original_query, feedback_text, rating.
-        # Let's call it with those specific fields from the UserFeedback Pydantic model.
-        
-        recorded_feedback = feedback_agent_instance.record_feedback(feedback_data)
+        recorded_feedback = await feedback_agent_instance.record_feedback(feedback_data)
         
         if recorded_feedback:
             return {"message": "Feedback recorded successfully", "feedback_id": recorded_feedback.timestamp} # Or some other ID
@@ -102,20 +160,41 @@ async def submit_feedback(feedback_data: UserFeedback):
             raise HTTPException(status_code=500, detail="Failed to record feedback.")
             
     except Exception as e:
-        print(f"Error processing feedback: {e}")
+        logger.exception("Error processing feedback: %s", e)
         raise HTTPException(status_code=500, detail=f"An error occurred while processing feedback: {str(e)}")
 
+@app.post("/feedback/batch/", status_code=201)
+async def submit_feedback_batch(feedback_batch: List[UserFeedback]):
+    """
+    Records several feedback entries in one request. They are queued together, so
+    the agent's writer appends and fsyncs them as a single batch.
+    """
+    logger.debug("Received %d feedback entries", len(feedback_batch))
+    recorded = await asyncio.gather(*(feedback_agent_instance.record_feedback(feedback) for feedback in feedback_batch))
+    if any(feedback is None for feedback in recorded):
+        raise HTTPException(status_code=500, detail="Failed to record feedback.")
+    return {"message": "Feedback recorded successfully", "feedback_ids": [feedback.timestamp for feedback in recorded]}
+
+@app.get("/feedback/version/")
+async def feedback_version():
+    """
+    Returns a version tag of the feedback log that changes when feedback is added.
+    Clients use it to reuse an earlier /feedback/analyze/ result while it is current.
+    """
+    return {"version": await feedback_agent_instance.log_version()}
+
 @app.get("/feedback/analyze/", response_model=FeedbackAnalysisResult)
 async def analyze_feedback_endpoint():
     """
     Analyzes all persisted user feedback and returns a summary.
     """
     try:
+        await feedback_agent_instance.flush() # Make queued feedback visible to the analyzer
         analysis_result = await feedback_analyzer_agent.analyze_feedback()
         return analysis_result
     except Exception as e:
         # Log the exception for server-side review
-        print(f"Error during feedback analysis endpoint: {e}") 
+        logger.exception("Error during feedback analysis endpoint: %s", e) 
         # Return a structured error response using the Pydantic model
         return FeedbackAnalysisResult(
             total_feedback_entries=0,
@@ -129,44 +208,39 @@ async def read_root():
     return {"message": "Welcome to the AI Research Advisor API. Use the /research/ endpoint to make requests."}
 
 @app.get("/sessions/")
-async def list_sessions():
+async def list_sessions(limit: int = Query(50, ge=1, le=1000), offset: int = Query(0, ge=0)):
     """
-    Lists all persisted session files.
+    Lists persisted session ids, newest first.
+    Use `?limit=` and `?offset=` to page through them.
     """
-    if not SESSIONS_DIR.exists() or not SESSIONS_DIR.is_dir():
-        return []
-    
-    session_files = sorted(
-        [f for f in os.listdir(SESSIONS_DIR) if f.startswith("session_") and f.endswith(".json")],
-        reverse=True
-    )
-    return session_files
+    return await session_store.newest_first(offset=offset, limit=limit)
 
-@app.get("/sessions/{session_filename}")
-async def get_session(session_filename: str):
+@app.get("/sessions/{session_filename}", response_model=ResearchResponse)
+async def get_session(session_filename: str, if_none_match: Optional[str] = Header(None)):
     """
-    Retrieves the content of a specific session file.
+    Retrieves the content of a specific session.
+    Sessions never change once stored, so the response carries an ETag; a request
+    whose If-None-Match still matches gets an empty 304 instead of the whole session.
     """
-    session_file_path = SESSIONS_DIR / session_filename
-    if not session_file_path.exists() or not session_file_path.is_file():
+    try:
+        session_json = await session_store.get(session_filename)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading session file: {str(e)}")
+    if session_json is None:
         raise HTTPException(status_code=404, detail="Session file not found")
-    
+
+    headers = {"ETag": f'"{hashlib.sha1(session_json).hexdigest()}"', "Cache-Control": "private, max-age=3600"}
+    if if_none_match is not None and headers["ETag"] in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
     try:
-        with open(session_file_path, "r") as f:
-            session_data = json.load(f)
-        # Ensure Pydantic models are reconstructed if they were stored as dicts
-        # This might be more complex depending on how ResearchGraphState serializes them
-        # For now, assume they are dicts that match the schema structure
-        return ResearchResponse(
-            original_query=session_data.get("original_query"),
-            deconstructed_queries=session_data.get("deconstructed_queries"),
-            retrieved_information=session_data.get("retrieved_information"),
-            plan=session_data.get("plan"),
-            summary=session_data.get("summary"),
-            error=session_data.get("error")
-        )
+        # The stored state is parsed and validated in a single pydantic-core pass, without an
+        # intermediate dict; state fields that aren't part of the response are ignored
+        session = ResearchResponse.model_validate_json(session_json)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading session file: {str(e)}")
+    # Already validated, so it is sent as is rather than re-encoded by FastAPI
+    return Response(content=session.model_dump_json(), media_type="application/json", headers=headers)
 
 # Mount static files if you have any (e.g., for a web interface)
 # app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -1,119 +1,369 @@
 import streamlit as st
 import requests # To make HTTP requests to the FastAPI backend
-import json # To pretty print dicts
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import orjson # To parse responses and pretty print dicts
 import datetime # To timestamp feedback
+import hashlib
+import threading
+import time
 
 # Configuration
 BACKEND_URL = "http://localhost:8000/research/" # Ensure this matches your FastAPI URL
+STREAM_BACKEND_URL = "http://localhost:8000/research/stream/" # Same research, streamed stage by stage
 FEEDBACK_BACKEND_URL = "http://localhost:8000/feedback/" # Added for feedback
 API_URL = "http://localhost:8000" # Base URL for API requests
+CONNECT_TIMEOUT = 5 # Seconds to establish a connection to the backend
+SESSION_VALIDATORS_SIZE = 32 # Sessions whose ETag and payload are kept for conditional reloads
+# Feedback that couldn't be sent is kept and retried on a later rerun, at most this often
+FEEDBACK_RETRY_INTERVAL = 2.0 # Seconds
+
+# Static sidebar text, joined once so each rerun sends it as a single element
+HOW_TO_RUN_MD = "\n".join([
+    "---",
+    "### How to Run:",
+    "1. **Setup Backend:**",
+    "   - Ensure `.env` is configured with your Azure OpenAI keys.",
+    "   - Open a terminal in the project root (`ai_research_advisor`).",
+    "   - Create a virtual environment: `python -m venv .venv`",
+    r"   - Activate it: `.\.venv\Scripts\activate` (Windows) or `source .venv/bin/activate` (Linux/macOS)",
+    "   - Install dependencies: `pip install -r requirements.txt`",
+    "   - Run FastAPI: `uvicorn app.main:app --reload --port 8000`",
+    "2. **Run Frontend (this app):**",
+    "   - Open another terminal in the project root.",
+    "   - Activate the virtual environment (if not already).",
+    "   - Run Streamlit: `streamlit run ui/streamlit_app.py`",
+])
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    One requests.Session shared by every rerun and user, so connections to the backend
+    are kept alive and reused instead of being opened for each call.
+    """
+    session = requests.Session()
+    # Retries cover connection errors on idempotent requests only; POSTs are never resent
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=Retry(total=2, backoff_factor=0.1))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_resource
+def get_request_pool() -> ThreadPoolExecutor:
+    """Worker threads for backend requests that don't depend on each other, so their latencies overlap."""
+    return ThreadPoolExecutor(max_workers=4)
+
+@st.cache_resource
+def warm_up_backend():
+    """
+    Opens a keep-alive connection to the backend on a daemon thread, once per process,
+    so the first research request doesn't spend its time connecting.
+    """
+    # Resolved here, on the script thread: cached functions need its ScriptRunContext
+    session = get_http_session()
+    def connect():
+        try:
+            session.get(f"{API_URL}/", timeout=2)
+        except requests.exceptions.RequestException:
+            pass # The backend may not be up yet; the first real request connects on its own
+    threading.Thread(target=connect, daemon=True).start()
+
+def text_key(text: str) -> str:
+    """Short stable id for a (possibly long, multi-line) query, for use in widget keys."""
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+def fetch_json(url: str, timeout: float = 10, session: requests.Session | None = None):
+    """
+    GETs a backend URL and returns the decoded JSON. In the request pool, pass the
+    session in: the pool's threads have no script context for cached functions.
+    """
+    response = (session or get_http_session()).get(url, timeout=timeout)
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+def submit_list_sessions():
+    """Starts fetching the sessions listing in the request pool; call .result() on what it returns."""
+    return get_request_pool().submit(fetch_json, f"{API_URL}/sessions/", session=get_http_session())
+
+@st.cache_resource
+def get_session_validators() -> tuple[OrderedDict, threading.Lock]:
+    """
+    ETag and payload of the SESSION_VALIDATORS_SIZE most recently fetched sessions,
+    shared by every rerun and user (hence the lock).
+    """
+    return OrderedDict(), threading.Lock()
+
+def fetch_session(session_file: str):
+    """
+    GETs a stored session, conditionally if it was fetched recently: the backend then
+    answers 304 with no body and the payload kept from last time is reused.
+    """
+    validators, lock = get_session_validators()
+    with lock:
+        known = validators.get(session_file)
+    headers = {"If-None-Match": known[0]} if known else {}
+    response = get_http_session().get(f"{API_URL}/sessions/{session_file}", headers=headers, timeout=30)
+    if known and response.status_code == 304:
+        session_data = known[1]
+    else:
+        response.raise_for_status()
+        session_data = orjson.loads(response.content)
+        if not (etag := response.headers.get("ETag")):
+            return session_data
+        known = (etag, session_data)
+    with lock:
+        validators[session_file] = known
+        validators.move_to_end(session_file)
+        while len(validators) > SESSION_VALIDATORS_SIZE:
+            validators.popitem(last=False)
+    return session_data
+
+# A stored session never changes once written, so repeat loads within the hour need no
+# request at all, and the ones after that only a 304
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_session(session_file: str):
+    return fetch_session(session_file)
+
+# Analysis is the most expensive action on the page (it may call the LLM); the result is
+# reused until the backend's feedback version changes
+@st.cache_data(ttl=600, show_spinner="Analyzing feedback…")
+def fetch_feedback_analysis(feedback_version: str):
+    return fetch_json(f"{API_URL}/feedback/analyze/", timeout=120)
+
+def queue_feedback(feedback_payload: dict):
+    """Adds feedback to this user's pending batch; flush_feedback sends it."""
+    st.session_state.setdefault("pending_feedback", []).append(feedback_payload)
+
+def flush_feedback(force: bool = False) -> Exception | None:
+    """
+    Sends all pending feedback in one POST to /feedback/batch/. Called on every submit
+    (with force) and on every rerun, where entries left over from a failed send are
+    retried at most every FEEDBACK_RETRY_INTERVAL seconds.
+    Returns the error if sending failed; the entries are then kept and retried.
+    """
+    pending = st.session_state.get("pending_feedback")
+    if not pending:
+        return None
+    if not force and time.time() - st.session_state.get("feedback_attempted_at", 0) < FEEDBACK_RETRY_INTERVAL:
+        return None
+    st.session_state.feedback_attempted_at = time.time()
+    try:
+        feedback_response = get_http_session().post(f"{FEEDBACK_BACKEND_URL}batch/", json=pending, timeout=30)
+        feedback_response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        return e
+    st.session_state.pending_feedback = []
+    return None
+
+def render_deconstructed_queries(deconstructed_queries: list):
+    st.subheader("🧩 Deconstructed Sub-Queries")
+    for i, sub_query in enumerate(deconstructed_queries):
+        st.markdown(f"**{i+1}.** {sub_query}")
+
+def snippet_text(info) -> str:
+    """
+    Markdown for a retrieved snippet. Strings are used as they are; anything else is
+    pretty-printed once per object and kept in session state for later reruns.
+    """
+    if isinstance(info, str):
+        return info
+    # Keyed by id, with the object kept alongside so the id can't be reused by another one
+    formatted = st.session_state.setdefault("snippet_texts", {})
+    cached = formatted.get(id(info))
+    if cached is not None and cached[0] is info:
+        return cached[1]
+    if len(formatted) >= 256: # Snippets of results that are no longer shown
+        formatted.clear()
+    text = orjson.dumps(info, option=orjson.OPT_INDENT_2).decode()
+    formatted[id(info)] = (info, text)
+    return text
+
+@st.fragment
+def render_snippet(sub_q: str, info):
+    """
+    One retrieved snippet in an expander. Its text is only rendered (and sent to the
+    browser) once the user asks for it, and toggling reruns just this fragment.
+    """
+    with st.expander(f"**Information for: '{sub_q}'**"):
+        if st.checkbox("Show", key=f"open_{text_key(sub_q)}"):
+            st.markdown(snippet_text(info))
+
+def render_retrieved_information(retrieved_info):
+    st.subheader("📚 Retrieved Information Snippets")
+    if isinstance(retrieved_info, dict):
+        for sub_q, info in retrieved_info.items():
+            render_snippet(sub_q, info)
+    else: # Fallback if the structure is not a dict (e.g. a simple string)
+        st.markdown(str(retrieved_info))
+
+def render_plan(plan_data: dict):
+    st.subheader("🗺️ Research Plan")
+    if plan_data.get("plan_steps"):
+        st.markdown("**Plan Steps:**")
+        for i, step in enumerate(plan_data["plan_steps"]):
+            st.markdown(f"{i+1}. {step}")
+
+    if plan_data.get("synthesis_questions"):
+        st.markdown("**Synthesis Questions:**")
+        for i, question in enumerate(plan_data["synthesis_questions"]):
+            st.markdown(f"{i+1}. {question}")
+
+def render_summary(summary_data: dict):
+    st.subheader("📊 Summary")
+    if summary_data.get("summary_text"):
+        st.markdown("**Summary Text:**")
+        st.markdown(summary_data["summary_text"])
+
+    if summary_data.get("key_points"):
+        st.markdown("**Key Points:**")
+        for i, point in enumerate(summary_data["key_points"]):
+            st.markdown(f"- {point}")
+
+RESULT_SECTIONS = ("original_query", "deconstructed_queries", "retrieved_information", "plan", "summary")
+
+def create_result_slots() -> dict:
+    """
+    One st.empty() placeholder per results section, in page order. Streamed stages and
+    stored results are all written into these, so each section is replaced in place.
+    """
+    return {section: st.empty() for section in RESULT_SECTIONS}
+
+def fill_result_slots(slots: dict, results: dict):
+    """Draws the sections present in `results` into their slots; the other slots are left as they are."""
+    if results.get("original_query"):
+        with slots["original_query"].container():
+            st.subheader("📝 Original Query")
+            st.markdown(f"> {results['original_query']}")
+    if results.get("deconstructed_queries"):
+        with slots["deconstructed_queries"].container():
+            render_deconstructed_queries(results["deconstructed_queries"])
+    if results.get("retrieved_information"):
+        with slots["retrieved_information"].container():
+            render_retrieved_information(results["retrieved_information"])
+    if results.get("plan"):
+        with slots["plan"].container():
+            render_plan(results["plan"])
+    if results.get("summary"):
+        with slots["summary"].container():
+            render_summary(results["summary"])
+
+def mark_missing_sections(slots: dict, results: dict):
+    """Fills the plan and summary slots of a finished result that has neither."""
+    if not results.get("plan"):
+        slots["plan"].info("No research plan was generated for this query.")
+    if not results.get("summary"):
+        slots["summary"].info("No summary was generated for this query.")
+
+@st.fragment
+def feedback_widget(original_query: str):
+    """
+    Typing feedback, moving the slider and submitting rerun only this fragment,
+    not the whole page (results, expanders and sidebar requests).
+    """
+    query_key = text_key(original_query or "")
+    st.markdown("---") # Visual separator
+    st.subheader("🗣️ Provide Feedback")
+    feedback_text = st.text_area("Let us know your thoughts on the results:", key=f"feedback_for_{query_key}")
+    feedback_rating = st.slider("Rate the quality of the results (1-5):", 1, 5, 3, key=f"rating_for_{query_key}")
+
+    if st.button("Submit Feedback", key=f"submit_feedback_{query_key}"):
+        if feedback_text:
+            feedback_payload = {
+                "original_query": original_query,
+                "feedback_text": feedback_text,
+                "rating": feedback_rating,
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat() # Generate timestamp in UI
+            }
+            queue_feedback(feedback_payload)
+            if feedback_error := flush_feedback(force=True):
+                # A fragment can't write to the sidebar, so the error is shown here
+                st.error(f"Failed to submit feedback: {feedback_error}. It is kept and will be sent again.")
+            else:
+                st.success("Thank you for your feedback!")
+        else:
+            st.warning("Please enter some feedback text before submitting.")
 
 st.set_page_config(page_title="AI Research Advisor", layout="wide")
 
+warm_up_backend()
+
+# The sessions listing for the sidebar is fetched once per browser session, and again only
+# after a research run or a click on Refresh; other reruns (every keystroke and slider move)
+# reuse the one in session state. It is fetched while the rest of the page renders
+# (including a research run), and only waited for when the sidebar needs it.
+sessions_future = None
+if "session_files" not in st.session_state:
+    sessions_future = submit_list_sessions()
+
+if feedback_error := flush_feedback():
+    st.sidebar.error(f"Failed to submit feedback: {feedback_error}")
+
 st.title("AI Research Advisor 🤖")
 st.caption("Your intelligent assistant for deconstructing and exploring complex topics.")
 
 # --- Main Application ---
 query = st.text_input("Enter your research query:", placeholder="e.g., Explain the impact of quantum computing on cryptography.")
 
-if st.button("🔍 Conduct Research", type="primary"):
+research_clicked = st.button("🔍 Conduct Research", type="primary")
+result_slots = create_result_slots()
+feedback_slot = st.empty()
+# The slots are filled at most once per run, as drawing the snippets twice would register
+# their widget keys twice. A research run fills them as it streams; otherwise they are
+# filled at the end of the run, once a session loaded from the sidebar may have replaced the results.
+
+if research_clicked:
     if query:
         with st.spinner("Thinking... Deconstructing query and retrieving information..."):
             try:
                 payload = {"query": query}
-                response = requests.post(BACKEND_URL, json=payload, timeout=300) # Increased timeout
-                response.raise_for_status()  # Raises an HTTPError for bad responses (4XX or 5XX)
-                
-                results = response.json()
-
-                st.subheader("📝 Original Query")
-                st.markdown(f"> {results.get('original_query', query)}")
-
-                if results.get("deconstructed_queries"):
-                    st.subheader("🧩 Deconstructed Sub-Queries")
-                    for i, sub_query in enumerate(results["deconstructed_queries"]):
-                        st.markdown(f"**{i+1}.** {sub_query}")
-                
-                if results.get("retrieved_information"):
-                    st.subheader("📚 Retrieved Information Snippets")
-                    retrieved_info = results["retrieved_information"]
-                    if isinstance(retrieved_info, dict):
-                        for sub_q, info in retrieved_info.items():
-                            with st.expander(f"**Information for: '{sub_q}'**"):
-                                st.markdown(info if isinstance(info, str) else json.dumps(info, indent=2))
-                    else: # Fallback if the structure is not a dict (e.g. a simple string)
-                        st.markdown(str(retrieved_info))
-                
-                # Display Research Plan
-                if results.get("plan"):
-                    st.subheader("🗺️ Research Plan")
-                    plan_data = results["plan"]
-                    if plan_data.get("plan_steps"):
-                        st.markdown("**Plan Steps:**")
-                        for i, step in enumerate(plan_data["plan_steps"]):
-                            st.markdown(f"{i+1}. {step}")
-                    
-                    if plan_data.get("synthesis_questions"):
-                        st.markdown("**Synthesis Questions:**")
-                        for i, question in enumerate(plan_data["synthesis_questions"]):
-                            st.markdown(f"{i+1}. {question}")
-                elif not results.get("error"): # Only show if no major error occurred and plan is missing
-                    st.info("No research plan was generated for this query.")
-
-                # Display Summary
-                if results.get("summary"):
-                    st.subheader("📊 Summary")
-                    summary_data = results["summary"]
-                    if summary_data.get("summary_text"):
-                        st.markdown("**Summary Text:**")
-                        st.markdown(summary_data["summary_text"])
-                    
-                    if summary_data.get("key_points"):
-                        st.markdown("**Key Points:**")
-                        for i, point in enumerate(summary_data["key_points"]):
-                            st.markdown(f"- {point}")
-                elif not results.get("error"): # Only show if no major error occurred and summary is missing
-                    st.info("No summary was generated for this query.")
-
-                # --- Feedback Section ---
-                st.markdown("---") # Visual separator
-                st.subheader("🗣️ Provide Feedback")
-                feedback_text = st.text_area("Let us know your thoughts on the results:", key=f"feedback_for_{results.get('original_query')}")
-                feedback_rating = st.slider("Rate the quality of the results (1-5):", 1, 5, 3, key=f"rating_for_{results.get('original_query')}")
-                
-                if st.button("Submit Feedback", key=f"submit_feedback_{results.get('original_query')}"):
-                    if feedback_text:
-                        feedback_payload = {
-                            "original_query": results.get('original_query', query),
-                            "feedback_text": feedback_text,
-                            "rating": feedback_rating,
-                            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat() # Generate timestamp in UI
-                        }
-                        try:
-                            feedback_response = requests.post(FEEDBACK_BACKEND_URL, json=feedback_payload, timeout=30)
-                            feedback_response.raise_for_status()
-                            st.success("Thank you for your feedback!")
-                        except requests.exceptions.HTTPError as http_err_feedback:
-                            st.error(f"Failed to submit feedback. HTTP error: {http_err_feedback}")
-                            try:
-                                error_detail_fb = feedback_response.json().get("detail", "No additional details.")
-                                st.error(f"Backend feedback error detail: {error_detail_fb}")
-                            except json.JSONDecodeError:
-                                st.error("Could not parse error response from feedback backend.")
-                        except Exception as e_fb:
-                            st.error(f"An unexpected error occurred while submitting feedback: {e_fb}")
-                    else:
-                        st.warning("Please enter some feedback text before submitting.")
+                st.session_state.current_research_response = None # Replaced once this run succeeds
+                results = {"original_query": query}
+                fill_result_slots(result_slots, results)
+                research_error = None
+                # Connecting gets a short timeout of its own, so an unreachable backend is reported
+                # right away instead of after the 300 seconds a research run may take.
+                # The stream is requested uncompressed, as gzip would hold events back.
+                with get_http_session().post(
+                    STREAM_BACKEND_URL, json=payload, stream=True,
+                    timeout=(CONNECT_TIMEOUT, 300), headers={"Accept-Encoding": "identity"}
+                ) as response:
+                    if not response.ok:
+                        response.content # Read the error body now; it is shown after the stream is closed
+                    response.raise_for_status()  # Raises an HTTPError for bad responses (4XX or 5XX)
+                    for line in response.iter_lines():
+                        if not line.startswith(b"data: "):
+                            continue
+                        event = orjson.loads(line[len(b"data: "):])
+                        if event["stage"] == "error":
+                            research_error = event["error"]
+                            break
+                        # Each section is drawn as soon as a stage produces it. Only sections
+                        # this event changed are drawn: the "done" event repeats them all, and
+                        # drawing the snippets twice in one run would register their keys twice
+                        update = {field: value for field, value in event["data"].items() if results.get(field) != value}
+                        results.update(update)
+                        fill_result_slots(result_slots, update)
+
+                if research_error:
+                    st.error(f"Backend error detail: {research_error}")
+                else:
+                    mark_missing_sections(result_slots, results)
+                    # Kept so later reruns (e.g. from the sidebar) still show it
+                    st.session_state.current_research_response = results
+                    # The run was saved as a new session, so the listing is fetched again
+                    sessions_future = submit_list_sessions()
 
             except requests.exceptions.HTTPError as http_err:
                 st.error(f"HTTP error occurred: {http_err}")
                 try:
-                    error_detail = response.json().get("detail", "No additional details provided.")
+                    error_detail = orjson.loads(response.content).get("detail", "No additional details provided.")
                     st.error(f"Backend error detail: {error_detail}")
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     st.error("Could not parse error response from backend.")
             except requests.exceptions.ConnectionError as conn_err:
-                st.error(f"Error connecting to the backend at {BACKEND_URL}. Is the backend running?")
+                st.error(f"Error connecting to the backend at {STREAM_BACKEND_URL}. Is the backend running?")
                 st.error(f"Details: {conn_err}")
             except requests.exceptions.Timeout as timeout_err:
                 st.error(f"The request to the backend timed out: {timeout_err}")
@@ -124,13 +374,15 @@ if st.button("🔍 Conduct Research", type="primary"):
 
 # --- Session Loading --- 
 st.sidebar.title("Past Research Sessions")
-session_files = []
 try:
-    response = requests.get(f"{API_URL}/sessions/")
-    response.raise_for_status()
-    session_files = response.json()
+    if st.sidebar.button("🔄 Refresh sessions"):
+        st.session_state.session_files = fetch_json(f"{API_URL}/sessions/")
+    elif sessions_future is not None:
+        st.session_state.session_files = sessions_future.result()
 except requests.exceptions.RequestException as e:
+    # Left unset, so the next rerun tries again
     st.sidebar.error(f"Error loading sessions: {e}")
+session_files = st.session_state.get("session_files") or []
 
 if session_files:
     selected_session_file = st.sidebar.selectbox(
@@ -141,48 +393,12 @@ if session_files:
     if selected_session_file != "Select a session":
         if st.sidebar.button("Load Session"): 
             try:
-                session_response = requests.get(f"{API_URL}/sessions/{selected_session_file}")
-                session_response.raise_for_status()
-                session_data = session_response.json()
-                
-                st.session_state.messages = [] # Clear current messages
-                st.session_state.clear_input = True # Signal to clear input
-
-                st.info(f"Loaded session: {selected_session_file}")
-                
-                # Display original query from loaded session
-                if session_data.get("original_query"):
-                    st.chat_message("user").write(session_data["original_query"])
-                    st.session_state.messages.append({"role": "user", "content": session_data["original_query"]})
-                
-                # Display assistant response from loaded session
-                with st.chat_message("assistant"):
-                    if session_data.get("deconstructed_queries"):
-                        st.subheader("Deconstructed Queries")
-                        for dq in session_data["deconstructed_queries"]:
-                            st.markdown(f"- {dq}")
-                    
-                    if session_data.get("retrieved_information"):
-                        st.subheader("Retrieved Information")
-                        for item in session_data["retrieved_information"]:
-                            st.markdown(f"- **Source:** {item.get('source', 'N/A')}")
-                            st.markdown(item.get('content', 'No content'))
-                            st.divider()
-
-                    if session_data.get("plan"):
-                        st.subheader("Research Plan")
-                        st.markdown(session_data["plan"].get("plan_steps", "No plan steps available."))
-
-                    if session_data.get("summary"):
-                        st.subheader("Summary")
-                        st.markdown(session_data["summary"].get("summary_text", "No summary available."))
-
-                    if session_data.get("error"):
-                        st.error(f"Error in research: {session_data['error']}")
-                
-                st.session_state.messages.append({"role": "assistant", "content": session_data})
+                session_data = load_session(selected_session_file)
+                # Drawn into the result slots at the end of this run, without rerunning the script
+                if session_data.get("error"):
+                    st.sidebar.error(f"Error in research: {session_data['error']}")
+                st.sidebar.success(f"Loaded session: {selected_session_file}")
                 st.session_state.current_research_response = session_data # Store for feedback
-                st.rerun() # Rerun to reflect loaded state and clear input
 
             except requests.exceptions.RequestException as e:
                 st.error(f"Error loading session {selected_session_file}: {e}")
@@ -191,6 +407,14 @@ if session_files:
 else:
     st.sidebar.info("No past sessions found.")
 
+if not research_clicked and st.session_state.get("current_research_response"):
+    fill_result_slots(result_slots, st.session_state.current_research_response)
+    mark_missing_sections(result_slots, st.session_state.current_research_response)
+
+if st.session_state.get("current_research_response"):
+    with feedback_slot.container():
+        feedback_widget(st.session_state.current_research_response.get("original_query"))
+
 # --- Session Loading / Feedback Analysis Display ---
 st.sidebar.title("Session Management & Feedback")
 
@@ -198,9 +422,10 @@ st.sidebar.title("Session Management & Feedback")
 st.sidebar.subheader("Feedback Analysis")
 if st.sidebar.button("Analyze All Feedback"):
     try:
-        analysis_response = requests.get(f"{API_URL}/feedback/analyze/")
-        analysis_response.raise_for_status()
-        analysis_data = analysis_response.json()
+        feedback_version = fetch_json(f"{API_URL}/feedback/version/")["version"]
+        analysis_data = fetch_feedback_analysis(feedback_version)
+        if analysis_data.get("error_message"):
+            fetch_feedback_analysis.clear() # A failed analysis is retried on the next click
 
         st.session_state.feedback_analysis_results = analysis_data
         
@@ -239,19 +464,7 @@ st.sidebar.info(
     "to help you break down complex research questions and gather initial information. "
     "The backend is built with FastAPI, and this UI is powered by Streamlit."
 )
-st.sidebar.markdown("---")
-st.sidebar.markdown("### How to Run:")
-st.sidebar.markdown("1. **Setup Backend:**")
-st.sidebar.markdown("   - Ensure `.env` is configured with your Azure OpenAI keys.")
-st.sidebar.markdown("   - Open a terminal in the project root (`ai_research_advisor`).")
-st.sidebar.markdown("   - Create a virtual environment: `python -m venv .venv`")
-st.sidebar.markdown(r"   - Activate it: `.\.venv\Scripts\activate` (Windows) or `source .venv/bin/activate` (Linux/macOS)")
-st.sidebar.markdown("   - Install dependencies: `pip install -r requirements.txt`")
-st.sidebar.markdown("   - Run FastAPI: `uvicorn app.main:app --reload --port 8000`")
-st.sidebar.markdown("2. **Run Frontend (this app):**")
-st.sidebar.markdown("   - Open another terminal in the project root.")
-st.sidebar.markdown("   - Activate the virtual environment (if not already).")
-st.sidebar.markdown("   - Run Streamlit: `streamlit run ui/streamlit_app.py`")
+st.sidebar.markdown(HOW_TO_RUN_MD)
 
 # To run this Streamlit app:
 # 1. Make sure the FastAPI backend is running (see app/main.py instructions).